@@ -4,31 +4,521 @@ Includes Pedalboard effects, custom EQ, 3D audio, and professional processing
 """
 
 import os
+import errno
 import logging
 import subprocess
 import json
 import asyncio
+import tempfile
+from collections import Counter, OrderedDict
 import numpy as np
 import soundfile as sf
-import librosa
 import pyloudnorm as pyln
-from typing import Dict, List, Tuple, Optional
+from scipy.signal import resample_poly, sosfilt
+from typing import AsyncIterator, Dict, Iterator, List, Tuple, Optional, Union
 from pedalboard import (
     Pedalboard, Reverb, Chorus, Phaser, Distortion, Compressor,
     Gain, LowpassFilter, HighpassFilter, PeakFilter, LowShelfFilter,
     HighShelfFilter, Limiter, Delay, Bitcrush
 )
 from pedalboard.io import AudioFile
+from config import Config
+from dsp_executor import DSPExecutor
 
 logger = logging.getLogger(__name__)
 
 
+class StreamingLoudnessMeter:
+    """
+    ITU-R BS.1770 integrated loudness measured block by block
+    Keeps K-weighting filter state across blocks and stores only one
+    energy value per 100 ms hop, so memory does not grow with block size
+    """
+
+    CHANNEL_WEIGHTS = [1.0, 1.0, 1.0, 1.41, 1.41]
+
+    def __init__(self, rate: int, channels: int, true_peak: bool = False):
+        self.rate = rate
+        self.channels = channels
+        self.hop = int(round(0.1 * rate))
+        self.true_peak = true_peak
+        self.peak = 0.0
+
+        self._sos = np.vstack([
+            self._biquad(4.0, 1 / np.sqrt(2), 1500.0, 'high_shelf'),
+            self._biquad(0.0, 0.5, 38.0, 'high_pass')
+        ])
+        self._zi = np.zeros((channels, self._sos.shape[0], 2))
+        self._hop_energy: List[np.ndarray] = []
+        self._partial = np.zeros(channels)
+        self._partial_len = 0
+        self._frames = 0
+
+    def _biquad(self, gain_db: float, q: float, fc: float, filter_type: str) -> np.ndarray:
+        """K-weighting stage coefficients (same design as pyloudnorm)"""
+        A = 10 ** (gain_db / 40.0)
+        w0 = 2.0 * np.pi * (fc / self.rate)
+        alpha = np.sin(w0) / (2.0 * q)
+
+        if filter_type == 'high_shelf':
+            b0 = A * ((A + 1) + (A - 1) * np.cos(w0) + 2 * np.sqrt(A) * alpha)
+            b1 = -2 * A * ((A - 1) + (A + 1) * np.cos(w0))
+            b2 = A * ((A + 1) + (A - 1) * np.cos(w0) - 2 * np.sqrt(A) * alpha)
+            a0 = (A + 1) - (A - 1) * np.cos(w0) + 2 * np.sqrt(A) * alpha
+            a1 = 2 * ((A - 1) - (A + 1) * np.cos(w0))
+            a2 = (A + 1) - (A - 1) * np.cos(w0) - 2 * np.sqrt(A) * alpha
+        else:
+            b0 = (1 + np.cos(w0)) / 2
+            b1 = -(1 + np.cos(w0))
+            b2 = (1 + np.cos(w0)) / 2
+            a0 = 1 + alpha
+            a1 = -2 * np.cos(w0)
+            a2 = 1 - alpha
+
+        return np.array([b0, b1, b2, a0, a1, a2]) / a0
+
+    def process(self, block: np.ndarray):
+        """Feed a (channels, frames) block"""
+        block = np.atleast_2d(block)
+        if self.true_peak:
+            self.peak = max(self.peak, self._block_true_peak(block))
+
+        weighted = np.empty(block.shape, dtype=np.float64)
+        for ch in range(self.channels):
+            weighted[ch], self._zi[ch] = sosfilt(self._sos, block[ch], zi=self._zi[ch])
+
+        squared = np.square(weighted)
+        pos = 0
+        total = squared.shape[1]
+        self._frames += total
+
+        while pos < total:
+            take = min(self.hop - self._partial_len, total - pos)
+            self._partial += squared[:, pos:pos + take].sum(axis=1)
+            self._partial_len += take
+            pos += take
+            if self._partial_len == self.hop:
+                self._hop_energy.append(self._partial)
+                self._partial = np.zeros(self.channels)
+                self._partial_len = 0
+
+    @staticmethod
+    def _block_true_peak(block: np.ndarray) -> float:
+        """Estimate true peak with 4x oversampling"""
+        if block.shape[1] < 2:
+            return float(np.max(np.abs(block), initial=0.0))
+        return float(np.max(np.abs(resample_poly(block, 4, 1, axis=1)), initial=0.0))
+
+    @staticmethod
+    def measure_true_peak(audio: np.ndarray, block_size: int = 0) -> float:
+        """True peak of a (channels, frames) buffer, oversampled block by block"""
+        block_size = block_size or Config.STREAMING_BLOCK_FRAMES
+        return max(
+            (StreamingLoudnessMeter._block_true_peak(audio[:, i:i + block_size])
+             for i in range(0, audio.shape[1], block_size)),
+            default=0.0
+        )
+
+    def integrated_loudness(self) -> float:
+        """Gated integrated loudness in LUFS (-inf when too short or silent)"""
+        hops = list(self._hop_energy)
+        if self._partial_len:
+            hops.append(self._partial)
+
+        block_len = 4 * self.hop
+        num_blocks = int(np.round((self._frames - block_len) / self.hop)) + 1
+        if self._frames < block_len or num_blocks < 1:
+            return float('-inf')
+
+        hops = np.array(hops).T
+        padded = np.zeros((self.channels, num_blocks + 3))
+        usable = min(hops.shape[1], padded.shape[1])
+        padded[:, :usable] = hops[:, :usable]
+
+        z = (padded[:, 0:num_blocks] + padded[:, 1:num_blocks + 1]
+             + padded[:, 2:num_blocks + 2] + padded[:, 3:num_blocks + 3]) / block_len
+        weights = np.array(self.CHANNEL_WEIGHTS[:self.channels]
+                           + [1.0] * max(0, self.channels - len(self.CHANNEL_WEIGHTS)))
+
+        with np.errstate(divide='ignore'):
+            block_loudness = -0.691 + 10.0 * np.log10(weights @ z)
+
+            gated = block_loudness >= -70.0
+            if not gated.any():
+                return float('-inf')
+            relative = -0.691 + 10.0 * np.log10(weights @ z[:, gated].mean(axis=1)) - 10.0
+
+            gated &= block_loudness > relative
+            if not gated.any():
+                return float('-inf')
+            return float(-0.691 + 10.0 * np.log10(weights @ z[:, gated].mean(axis=1)))
+
+
+class FFmpegPCMReader:
+    """
+    Decode any FFmpeg-readable input to float32 PCM through a raw pipe
+    Resampling and downmixing happen inside FFmpeg; the reader exposes the
+    subset of pedalboard.io.AudioFile used for block streaming
+    """
+
+    def __init__(
+        self,
+        input_file: str,
+        sample_rate: int,
+        num_channels: int,
+        duration: float = 0
+    ):
+        self.samplerate = sample_rate
+        self.num_channels = num_channels
+        self.frames = int(duration * sample_rate)
+        self._position = 0
+        self._errors = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            [
+                'ffmpeg', '-v', 'error', '-nostdin', '-i', input_file, '-vn',
+                '-f', 'f32le', '-acodec', 'pcm_f32le',
+                '-ar', str(sample_rate), '-ac', str(num_channels), 'pipe:1'
+            ],
+            stdout=subprocess.PIPE,
+            stderr=self._errors
+        )
+
+    def __enter__(self) -> 'FFmpegPCMReader':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def tell(self) -> int:
+        return self._position
+
+    def read_into(self, buffer: np.ndarray) -> int:
+        """
+        Fill a C-contiguous (frames, channels) float32 buffer in place
+        Returns the number of whole frames read (fewer only at end of stream)
+        """
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        at_end = False
+        while filled < len(view):
+            count = self._process.stdout.readinto(view[filled:])
+            if not count:
+                at_end = True
+                break
+            filled += count
+
+        frames = filled // (4 * self.num_channels)
+        self._position += frames
+        if at_end:
+            self._check_finished()
+        return frames
+
+    def _stderr_tail(self) -> str:
+        self._errors.seek(0)
+        return self._errors.read().decode(errors='ignore')[-500:].strip()
+
+    def _check_finished(self):
+        """At end of stream FFmpeg must have exited cleanly and produced audio"""
+        returncode = self._process.wait()
+        if returncode != 0:
+            raise RuntimeError(f"Decoding failed (ffmpeg exit {returncode}): {self._stderr_tail()}")
+        if self._position == 0:
+            raise RuntimeError("No audio decoded from input")
+
+    def read(self, num_frames: int) -> np.ndarray:
+        """Read up to num_frames and return a (channels, frames) array"""
+        buffer = np.empty((num_frames, self.num_channels), dtype=np.float32)
+        frames = self.read_into(buffer)
+        return buffer[:frames].T
+
+    def close(self):
+        """Stop FFmpeg and log anything it reported"""
+        if self._process.poll() is None:
+            self._process.stdout.close()
+            self._process.kill()
+        self._process.wait()
+        stderr = self._stderr_tail()
+        self._errors.close()
+        if stderr:
+            logger.warning("Decoder: %s", stderr)
+
+
+class PCMEncoder:
+    """
+    FFmpeg encoder fed with interleaved float32 PCM on stdin
+    Used inside DSP workers: blocking pipe writes throttle the producer to
+    the encoder's pace while FFmpeg encodes concurrently in its own process
+    """
+
+    def __init__(
+        self,
+        output_file: str,
+        settings: Dict,
+        sample_rate: int,
+        num_channels: int,
+        duration: float = 0
+    ):
+        filters = AdvancedAudioProcessor.build_filter_chain(
+            bass_boost=settings.get('bass_boost', 0),
+            fade_in=settings.get('fade_in', 0),
+            fade_out=settings.get('fade_out', 0),
+            speed=settings.get('speed', 1.0),
+            duration=duration
+        )
+
+        cmd = ['ffmpeg', '-v', 'error']
+        cmd.extend(AdvancedAudioProcessor.pcm_input_args(sample_rate, num_channels))
+        cmd.append('-y')
+        if filters:
+            cmd.extend(['-af', ','.join(filters)])
+        cmd.extend(AdvancedAudioProcessor.build_encoder_args(
+            settings.get('format', 'mp3'),
+            settings.get('bitrate', '320k'),
+            settings.get('sample_rate', 48000),
+            settings.get('channels', 2)
+        ))
+        cmd.append(output_file)
+
+        self._errors = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=self._errors
+        )
+
+    def write(self, block: np.ndarray):
+        """Write a (channels, frames) block"""
+        data = AdvancedAudioProcessor.interleave(block)
+        chunk_size = 1024 * 1024
+        for offset in range(0, len(data), chunk_size):
+            self._process.stdin.write(data[offset:offset + chunk_size])
+
+    def close(self) -> bool:
+        """Finish encoding and report success"""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+        self._process.wait()
+        self._errors.seek(0)
+        stderr = self._errors.read()
+        self._errors.close()
+
+        if self._process.returncode != 0:
+            logger.error("Encoder failed: %s", stderr.decode(errors='ignore')[-500:])
+            return False
+        return True
+
+    def abort(self):
+        """Kill the encoder after a failed write"""
+        self._process.kill()
+        self.close()
+
+
+class AudioInfoCache:
+    """
+    LRU cache of parsed FFprobe metadata
+    Keyed by (path, size, mtime) so a replaced or rewritten file is re-probed
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], Dict]" = OrderedDict()
+
+    @staticmethod
+    def _key(file_path: str) -> Optional[Tuple[str, int, int]]:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns)
+
+    def get(self, file_path: str) -> Optional[Dict]:
+        """Return cached info for an unchanged file"""
+        key = self._key(file_path)
+        if key is None or key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return dict(self._entries[key])
+
+    def put(self, file_path: str, info: Dict):
+        """Store info for the file's current size/mtime"""
+        key = self._key(file_path)
+        if key is None or not info:
+            return
+        self._entries[key] = dict(info)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class StreamingProbe:
+    """
+    FFprobe fed from an in-progress download
+    Parses container and stream headers from the first bytes of a file
+    while the rest is still arriving, so metadata is ready the moment the
+    last byte lands. Formats whose headers are not at the front (e.g. MP4
+    with a trailing moov atom) yield no result and fall back to a normal probe
+    """
+
+    HEAD_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, head_bytes: int = HEAD_BYTES):
+        self.head_bytes = head_bytes
+        self._fed = 0
+        self._process = None
+        self._input_closed = False
+
+    async def feed(self, offset: int, data: bytes):
+        """
+        Pass bytes of the file starting at offset
+        Bytes already fed are skipped, so a retried download can replay its head
+        """
+        if self._input_closed or offset + len(data) <= self._fed:
+            return
+        if offset > self._fed:
+            self.abort()
+            return
+        data = data[self._fed - offset:]
+
+        try:
+            if self._process is None:
+                self._process = await asyncio.create_subprocess_exec(
+                    'ffprobe', '-v', 'quiet', '-print_format', 'json',
+                    '-show_format', '-show_streams', '-i', 'pipe:0',
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL
+                )
+
+            head = data[:self.head_bytes - self._fed]
+            self._process.stdin.write(head)
+            await self._process.stdin.drain()
+            self._fed += len(head)
+
+            if self._fed >= self.head_bytes:
+                self._close_input()
+        except (BrokenPipeError, ConnectionResetError):
+            # FFprobe already has what it needs and exited
+            self._input_closed = True
+        except Exception as e:
+            logger.warning("Streaming probe failed: %s", e)
+            self.abort()
+
+    def _close_input(self):
+        if not self._input_closed:
+            self._input_closed = True
+            try:
+                self._process.stdin.close()
+            except Exception:
+                pass
+
+    async def finish(self, file_path: str, file_size: int) -> Dict:
+        """
+        Collect the parsed info for the completed file and cache it
+        Returns {} when the headers were not enough for a full result
+        """
+        if self._process is None:
+            return {}
+
+        self._close_input()
+        try:
+            stdout, _ = await asyncio.wait_for(self._process.communicate(), timeout=10)
+            info = AdvancedAudioProcessor.parse_probe_output(json.loads(stdout.decode() or '{}'))
+        except Exception:
+            self.abort()
+            return {}
+
+        if info.get('codec', 'unknown') == 'unknown' or not info.get('duration'):
+            return {}
+
+        info['size'] = file_size
+        AdvancedAudioProcessor.info_cache.put(file_path, info)
+        return info
+
+    def abort(self):
+        """Stop FFprobe without collecting a result"""
+        self._input_closed = True
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except ProcessLookupError:
+                pass
+
+
 class AdvancedAudioProcessor:
     """Professional audio processing with industry-standard tools"""
 
+    info_cache = AudioInfoCache()
+    conversion_stats: Counter = Counter()
+
+    # FFprobe codec name an input must have to be stream-copied to a format
+    STREAM_CODECS = {
+        'mp3': 'mp3',
+        'm4a': 'aac',
+        'aac': 'aac',
+        'ogg': 'vorbis',
+        'opus': 'opus',
+        'flac': 'flac',
+        'wav': 'pcm_s16le',
+        'alac': 'alac',
+        'wma': 'wmav2',
+        'ac3': 'ac3',
+        'webm': 'opus'
+    }
+
+    # FFprobe demuxer name matching the container each format is written in
+    CONTAINER_FORMATS = {
+        'mp3': 'mp3',
+        'm4a': 'mp4',
+        'aac': 'aac',
+        'ogg': 'ogg',
+        'opus': 'ogg',
+        'flac': 'flac',
+        'wav': 'wav',
+        'wma': 'asf',
+        'ac3': 'ac3',
+        'webm': 'webm'
+    }
+
+    # OSError codes that say the host, not the input, is at fault
+    TRANSIENT_ERRNOS = (errno.ENOSPC, errno.EDQUOT, errno.EIO, errno.ENOMEM, errno.EAGAIN)
+
+    @staticmethod
+    def is_transient(error: BaseException) -> bool:
+        """
+        Whether a render failure may succeed on another attempt (out of
+        memory or disk) rather than being the input's fault. A dead pool
+        worker is not: the render that killed it would only kill the next one
+        """
+        if isinstance(error, MemoryError):
+            return True
+        return isinstance(error, OSError) and error.errno in AdvancedAudioProcessor.TRANSIENT_ERRNOS
+
     @staticmethod
-    async def get_audio_info(file_path: str) -> Dict:
-        """Extract detailed audio information using FFprobe"""
+    async def _dispatch(func, *args) -> bool:
+        """
+        Run a blocking DSP implementation in the shared executor
+        Transient failures are raised for the caller to retry; others return False
+        """
+        try:
+            return await DSPExecutor.run(func, *args)
+        except Exception as e:
+            if AdvancedAudioProcessor.is_transient(e):
+                raise
+            logger.exception("DSP executor error in %s", func.__name__)
+            return False
+
+    @staticmethod
+    async def get_audio_info(file_path: str, use_cache: bool = True) -> Dict:
+        """Extract detailed audio information using FFprobe (cached per file version)"""
+        if use_cache:
+            cached = AdvancedAudioProcessor.info_cache.get(file_path)
+            if cached:
+                return cached
+
         try:
             cmd = [
                 'ffprobe', '-v', 'quiet', '-print_format', 'json',
@@ -40,63 +530,212 @@ class AdvancedAudioProcessor:
                 stderr=asyncio.subprocess.PIPE
             )
             stdout, _ = await result.communicate()
-            data = json.loads(stdout.decode())
+            info = AdvancedAudioProcessor.parse_probe_output(json.loads(stdout.decode()))
+            AdvancedAudioProcessor.info_cache.put(file_path, info)
+            return info
+        except Exception as e:
+            logger.exception("Error getting audio info")
+            return {}
 
-            audio_stream = next(
-                (s for s in data.get('streams', []) if s['codec_type'] == 'audio'),
-                {}
-            )
-            format_info = data.get('format', {})
+    @staticmethod
+    def probe_sync(file_path: str) -> Dict:
+        """Blocking FFprobe call for use inside DSP workers"""
+        cached = AdvancedAudioProcessor.info_cache.get(file_path)
+        if cached:
+            return cached
 
-            return {
-                'codec': audio_stream.get('codec_name', 'unknown'),
-                'bitrate': int(audio_stream.get('bit_rate', 0)) // 1000 if audio_stream.get('bit_rate') else 0,
-                'sample_rate': int(audio_stream.get('sample_rate', 0)),
-                'channels': audio_stream.get('channels', 0),
-                'duration': float(format_info.get('duration', 0)),
-                'size': int(format_info.get('size', 0)),
-                'format': format_info.get('format_name', 'unknown')
-            }
+        try:
+            result = subprocess.run(
+                [
+                    'ffprobe', '-v', 'quiet', '-print_format', 'json',
+                    '-show_format', '-show_streams', file_path
+                ],
+                capture_output=True,
+                check=False
+            )
+            info = AdvancedAudioProcessor.parse_probe_output(json.loads(result.stdout.decode()))
+            AdvancedAudioProcessor.info_cache.put(file_path, info)
+            return info
         except Exception as e:
             logger.exception("Error getting audio info")
             return {}
 
+    @staticmethod
+    def parse_probe_output(data: Dict) -> Dict:
+        """Reduce FFprobe JSON to the fields used by the bot"""
+        audio_streams = [s for s in data.get('streams', []) if s.get('codec_type') == 'audio']
+        audio_stream = audio_streams[0] if audio_streams else {}
+        format_info = data.get('format', {})
+
+        def stream_details(stream: Dict) -> Dict:
+            bit_depth = stream.get('bits_per_raw_sample') or stream.get('bits_per_sample') or 0
+            return {
+                'index': stream.get('index', 0),
+                'codec': stream.get('codec_name', 'unknown'),
+                'sample_fmt': stream.get('sample_fmt', ''),
+                'bit_depth': int(bit_depth),
+                'channel_layout': stream.get('channel_layout', ''),
+                'duration': float(stream.get('duration', 0) or 0)
+            }
+
+        details = stream_details(audio_stream)
+        duration = float(format_info.get('duration', 0) or 0) or details['duration']
+
+        return {
+            'codec': audio_stream.get('codec_name', 'unknown'),
+            'bitrate': int(audio_stream.get('bit_rate', 0)) // 1000 if audio_stream.get('bit_rate') else 0,
+            'sample_rate': int(audio_stream.get('sample_rate', 0)),
+            'channels': audio_stream.get('channels', 0),
+            'duration': duration,
+            'size': int(format_info.get('size', 0)),
+            'format': format_info.get('format_name', 'unknown'),
+            'bit_depth': details['bit_depth'],
+            'sample_fmt': details['sample_fmt'],
+            'channel_layout': details['channel_layout'],
+            'streams': [stream_details(stream) for stream in audio_streams]
+        }
+
+    @staticmethod
+    def open_reader(
+        input_file: str,
+        sample_rate: int,
+        channels: Optional[int] = None,
+        audio_info: Optional[Dict] = None
+    ):
+        """
+        Open a block reader resampled to sample_rate
+        Uses pedalboard's native AudioFile when it can read the container,
+        otherwise (AAC, M4A, WMA, AC3, AMR, ...) or when downmixing, an FFmpeg pipe
+        """
+        if channels is None:
+            try:
+                return AudioFile(input_file).resampled_to(sample_rate)
+            except Exception:
+                pass
+
+        info = audio_info or AdvancedAudioProcessor.probe_sync(input_file)
+        return FFmpegPCMReader(
+            input_file,
+            sample_rate,
+            channels or info.get('channels') or 2,
+            info.get('duration', 0)
+        )
+
+    @staticmethod
+    def decode_pcm(
+        input_file: str,
+        sample_rate: int = 48000,
+        channels: Optional[int] = None,
+        audio_info: Optional[Dict] = None
+    ) -> np.ndarray:
+        """
+        Decode a whole file to a (channels, frames) float32 array via FFmpeg
+        The buffer is preallocated from the probed duration and filled in place
+        """
+        info = audio_info or AdvancedAudioProcessor.probe_sync(input_file)
+        channels = channels or info.get('channels') or 2
+        capacity = int(info.get('duration', 0) * sample_rate) + sample_rate
+        buffer = np.empty((capacity, channels), dtype=np.float32)
+        frames = 0
+
+        with FFmpegPCMReader(input_file, sample_rate, channels) as reader:
+            while True:
+                frames += reader.read_into(buffer[frames:])
+                if frames < len(buffer):
+                    break
+
+                grown = np.empty((len(buffer) * 3 // 2, channels), dtype=np.float32)
+                grown[:frames] = buffer
+                buffer = grown
+
+        return buffer[:frames].T
+
+    @staticmethod
+    def build_eq_plugins(eq_settings: List[Dict[str, float]]) -> List:
+        """Translate EQ bands into shelf/peak filter plugins"""
+        plugins = []
+
+        for eq in eq_settings:
+            freq = eq.get('freq', 1000)
+            gain_db = eq.get('gain', 0)
+            q = eq.get('q', 1.0)
+
+            if 20 <= freq <= 40000 and -20 <= gain_db <= 20:
+                if freq < 200:
+                    plugins.append(LowShelfFilter(cutoff_frequency_hz=freq, gain_db=gain_db))
+                elif freq > 8000:
+                    plugins.append(HighShelfFilter(cutoff_frequency_hz=freq, gain_db=gain_db))
+                else:
+                    plugins.append(PeakFilter(cutoff_frequency_hz=freq, gain_db=gain_db, q=q))
+
+        return plugins
+
+    @staticmethod
+    def build_effect_plugins(effects: List[str]) -> List:
+        """Translate effect names into configured Pedalboard plugins"""
+        plugins = []
+
+        for effect in effects:
+            effect_lower = effect.lower()
+
+            if effect_lower == 'reverb':
+                plugins.append(Reverb(room_size=0.5, damping=0.5, wet_level=0.33))
+            elif effect_lower == 'chorus':
+                plugins.append(Chorus(rate_hz=1.0, depth=0.25, centre_delay_ms=7.0, feedback=0.0, mix=0.5))
+            elif effect_lower == 'phaser':
+                plugins.append(Phaser(rate_hz=1.0, depth=0.5, centre_frequency_hz=1300.0, feedback=0.0, mix=0.5))
+            elif effect_lower == 'distortion':
+                plugins.append(Distortion(drive_db=25))
+            elif effect_lower == 'compressor':
+                plugins.append(Compressor(threshold_db=-16, ratio=4, attack_ms=1.0, release_ms=100))
+            elif effect_lower == 'delay':
+                plugins.append(Delay(delay_seconds=0.25, feedback=0.3, mix=0.5))
+            elif effect_lower == 'bitcrush':
+                plugins.append(Bitcrush(bit_depth=8))
+            elif effect_lower == 'limiter':
+                plugins.append(Limiter(threshold_db=-1.0, release_ms=100))
+
+        return plugins
+
     @staticmethod
     async def apply_eq(
         input_file: str,
         output_file: str,
         eq_settings: List[Dict[str, float]],
-        sample_rate: int = 48000
+        sample_rate: int = 48000,
+        streaming: Optional[bool] = None
     ) -> bool:
         """
         Apply custom parametric EQ with specified frequencies and gains
         eq_settings: [{"freq": 100, "gain": 2.0}, {"freq": 1000, "gain": -1.5}, ...]
         """
-        try:
-            audio, sr = sf.read(input_file)
-            if sr != sample_rate:
-                audio = librosa.resample(audio, orig_sr=sr, target_sr=sample_rate)
-                sr = sample_rate
-
-            board = Pedalboard()
+        return await AdvancedAudioProcessor._dispatch(
+            AdvancedAudioProcessor._apply_eq_sync,
+            input_file, output_file, eq_settings, sample_rate, streaming
+        )
 
-            for eq in eq_settings:
-                freq = eq.get('freq', 1000)
-                gain_db = eq.get('gain', 0)
-                q = eq.get('q', 1.0)
+    @staticmethod
+    def _apply_eq_sync(
+        input_file: str,
+        output_file: str,
+        eq_settings: List[Dict[str, float]],
+        sample_rate: int = 48000,
+        streaming: Optional[bool] = None
+    ) -> bool:
+        """Blocking implementation of apply_eq, run inside the DSP executor"""
+        try:
+            if AdvancedAudioProcessor.use_streaming(input_file, streaming, sample_rate):
+                board = Pedalboard(AdvancedAudioProcessor.build_eq_plugins(eq_settings))
+                AdvancedAudioProcessor._stream_process(input_file, output_file, board, sample_rate)
+                logger.info("EQ applied successfully (streamed): %d bands", len(eq_settings))
+                return True
 
-                if 20 <= freq <= 40000 and -20 <= gain_db <= 20:
-                    if freq < 200:
-                        board.append(LowShelfFilter(cutoff_frequency_hz=freq, gain_db=gain_db))
-                    elif freq > 8000:
-                        board.append(HighShelfFilter(cutoff_frequency_hz=freq, gain_db=gain_db))
-                    else:
-                        board.append(PeakFilter(cutoff_frequency_hz=freq, gain_db=gain_db, q=q))
+            audio = AdvancedAudioProcessor.decode_pcm(input_file, sample_rate)
+            sr = sample_rate
 
-            if len(audio.shape) == 1:
-                audio = audio.reshape(-1, 1)
+            board = Pedalboard(AdvancedAudioProcessor.build_eq_plugins(eq_settings))
 
-            processed = board(audio.T, sr)
+            processed = board(audio, sr)
 
             sf.write(output_file, processed.T, sr)
             logger.info("EQ applied successfully: %d bands", len(eq_settings))
@@ -111,44 +750,40 @@ class AdvancedAudioProcessor:
         input_file: str,
         output_file: str,
         effects: List[str],
-        sample_rate: int = 48000
+        sample_rate: int = 48000,
+        streaming: Optional[bool] = None
     ) -> bool:
         """
         Apply Pedalboard effects
         Available effects: reverb, chorus, phaser, distortion, compressor, delay, bitcrush
         """
+        return await AdvancedAudioProcessor._dispatch(
+            AdvancedAudioProcessor._apply_pedalboard_effects_sync,
+            input_file, output_file, effects, sample_rate, streaming
+        )
+
+    @staticmethod
+    def _apply_pedalboard_effects_sync(
+        input_file: str,
+        output_file: str,
+        effects: List[str],
+        sample_rate: int = 48000,
+        streaming: Optional[bool] = None
+    ) -> bool:
+        """Blocking implementation of apply_pedalboard_effects, run inside the DSP executor"""
         try:
-            audio, sr = sf.read(input_file)
-            if sr != sample_rate:
-                audio = librosa.resample(audio, orig_sr=sr, target_sr=sample_rate)
-                sr = sample_rate
-
-            board = Pedalboard()
-
-            for effect in effects:
-                effect_lower = effect.lower()
-
-                if effect_lower == 'reverb':
-                    board.append(Reverb(room_size=0.5, damping=0.5, wet_level=0.33))
-                elif effect_lower == 'chorus':
-                    board.append(Chorus(rate_hz=1.0, depth=0.25, centre_delay_ms=7.0, feedback=0.0, mix=0.5))
-                elif effect_lower == 'phaser':
-                    board.append(Phaser(rate_hz=1.0, depth=0.5, centre_frequency_hz=1300.0, feedback=0.0, mix=0.5))
-                elif effect_lower == 'distortion':
-                    board.append(Distortion(drive_db=25))
-                elif effect_lower == 'compressor':
-                    board.append(Compressor(threshold_db=-16, ratio=4, attack_ms=1.0, release_ms=100))
-                elif effect_lower == 'delay':
-                    board.append(Delay(delay_seconds=0.25, feedback=0.3, mix=0.5))
-                elif effect_lower == 'bitcrush':
-                    board.append(Bitcrush(bit_depth=8))
-                elif effect_lower == 'limiter':
-                    board.append(Limiter(threshold_db=-1.0, release_ms=100))
-
-            if len(audio.shape) == 1:
-                audio = audio.reshape(-1, 1)
-
-            processed = board(audio.T, sr)
+            if AdvancedAudioProcessor.use_streaming(input_file, streaming, sample_rate):
+                board = Pedalboard(AdvancedAudioProcessor.build_effect_plugins(effects))
+                AdvancedAudioProcessor._stream_process(input_file, output_file, board, sample_rate)
+                logger.info("Pedalboard effects applied (streamed): %s", ', '.join(effects))
+                return True
+
+            audio = AdvancedAudioProcessor.decode_pcm(input_file, sample_rate)
+            sr = sample_rate
+
+            board = Pedalboard(AdvancedAudioProcessor.build_effect_plugins(effects))
+
+            processed = board(audio, sr)
 
             sf.write(output_file, processed.T, sr)
             logger.info("Pedalboard effects applied: %s", ', '.join(effects))
@@ -163,23 +798,65 @@ class AdvancedAudioProcessor:
         input_file: str,
         output_file: str,
         target_lufs: float = -14.0,
-        sample_rate: int = 48000
+        sample_rate: int = 48000,
+        true_peak_db: Optional[float] = None,
+        streaming: Optional[bool] = None
     ) -> bool:
-        """Normalize audio to target LUFS using industry standard"""
+        """
+        Normalize audio to target LUFS using industry standard
+        true_peak_db: optional ceiling; gain is reduced so the 4x oversampled
+        peak stays at or below it
+        streaming: two passes over fixed-size blocks (None = decide by decoded size)
+        """
+        return await AdvancedAudioProcessor._dispatch(
+            AdvancedAudioProcessor._normalize_audio_sync,
+            input_file, output_file, target_lufs, sample_rate, true_peak_db, streaming
+        )
+
+    @staticmethod
+    def _normalize_audio_sync(
+        input_file: str,
+        output_file: str,
+        target_lufs: float = -14.0,
+        sample_rate: int = 48000,
+        true_peak_db: Optional[float] = None,
+        streaming: Optional[bool] = None
+    ) -> bool:
+        """Blocking implementation of normalize_audio, run inside the DSP executor"""
         try:
-            audio, sr = sf.read(input_file)
-            if sr != sample_rate:
-                audio = librosa.resample(audio, orig_sr=sr, target_sr=sample_rate)
-                sr = sample_rate
+            if AdvancedAudioProcessor.use_streaming(input_file, streaming, sample_rate):
+                board = Pedalboard()
+
+                with AdvancedAudioProcessor.open_reader(input_file, sample_rate) as f:
+                    meter = StreamingLoudnessMeter(sample_rate, f.num_channels, true_peak_db is not None)
+                    for block in AdvancedAudioProcessor.iter_processed_blocks(f, board, sample_rate):
+                        meter.process(block)
+
+                gain = np.float32(AdvancedAudioProcessor.loudness_gain(
+                    meter.integrated_loudness(), target_lufs, meter.peak, true_peak_db
+                ))
+
+                with AdvancedAudioProcessor.open_reader(input_file, sample_rate) as f:
+                    with AudioFile(output_file, 'w', sample_rate, f.num_channels) as out:
+                        for block in AdvancedAudioProcessor.iter_processed_blocks(f, board, sample_rate):
+                            out.write(block * gain)
+
+                logger.info("Audio normalized to %.1f LUFS (streamed, gain %.2f)", target_lufs, gain)
+                return True
+
+            audio = AdvancedAudioProcessor.decode_pcm(input_file, sample_rate)
+            sr = sample_rate
 
             meter = pyln.Meter(sr)
 
-            if len(audio.shape) == 1:
-                loudness = meter.integrated_loudness(audio)
-            else:
-                loudness = meter.integrated_loudness(audio)
+            loudness = meter.integrated_loudness(audio.T)
 
-            normalized_audio = pyln.normalize.loudness(audio, loudness, target_lufs)
+            if true_peak_db is not None:
+                peak = StreamingLoudnessMeter.measure_true_peak(audio)
+                gain = AdvancedAudioProcessor.loudness_gain(loudness, target_lufs, peak, true_peak_db)
+                normalized_audio = audio.T * gain
+            else:
+                normalized_audio = pyln.normalize.loudness(audio.T, loudness, target_lufs)
 
             sf.write(output_file, normalized_audio, sr)
             logger.info("Audio normalized to %.1f LUFS", target_lufs)
@@ -189,6 +866,22 @@ class AdvancedAudioProcessor:
             logger.exception("Error normalizing audio")
             return False
 
+    @staticmethod
+    def loudness_gain(
+        loudness: float,
+        target_lufs: float,
+        peak: float = 0.0,
+        true_peak_db: Optional[float] = None
+    ) -> float:
+        """Linear gain that moves loudness to target, capped by a true-peak ceiling"""
+        if not np.isfinite(loudness):
+            return 1.0
+
+        gain = 10.0 ** ((target_lufs - loudness) / 20.0)
+        if true_peak_db is not None and peak > 0:
+            gain = min(gain, 10.0 ** (true_peak_db / 20.0) / peak)
+        return gain
+
     @staticmethod
     async def create_3d_audio(
         input_file: str,
@@ -202,14 +895,23 @@ class AdvancedAudioProcessor:
         azimuth: horizontal angle (-180 to 180)
         elevation: vertical angle (-90 to 90)
         """
-        try:
-            audio, sr = sf.read(input_file)
-            if sr != sample_rate:
-                audio = librosa.resample(audio, orig_sr=sr, target_sr=sample_rate)
-                sr = sample_rate
+        return await AdvancedAudioProcessor._dispatch(
+            AdvancedAudioProcessor._create_3d_audio_sync,
+            input_file, output_file, azimuth, elevation, sample_rate
+        )
 
-            if len(audio.shape) > 1:
-                audio = np.mean(audio, axis=1)
+    @staticmethod
+    def _create_3d_audio_sync(
+        input_file: str,
+        output_file: str,
+        azimuth: float = 0,
+        elevation: float = 0,
+        sample_rate: int = 48000
+    ) -> bool:
+        """Blocking implementation of create_3d_audio, run inside the DSP executor"""
+        try:
+            audio = AdvancedAudioProcessor.decode_pcm(input_file, sample_rate, channels=1)[0]
+            sr = sample_rate
 
             delay_samples = int(0.0006 * sr * np.sin(np.radians(azimuth)))
             itd = np.abs(delay_samples)
@@ -244,9 +946,82 @@ class AdvancedAudioProcessor:
             logger.exception("Error creating 3D audio")
             return False
 
+    @staticmethod
+    def build_filter_chain(
+        bass_boost: int = 0,
+        normalize: bool = False,
+        fade_in: float = 0,
+        fade_out: float = 0,
+        speed: float = 1.0,
+        duration: float = 0
+    ) -> List[str]:
+        """Build the FFmpeg audio filter chain for the encoder stage"""
+        filters = []
+
+        if bass_boost > 0:
+            filters.append(f'equalizer=f=100:width_type=h:width=200:g={bass_boost}')
+
+        if normalize:
+            filters.append('loudnorm=I=-16:TP=-1.5:LRA=11')
+
+        if fade_in > 0:
+            filters.append(f'afade=t=in:st=0:d={fade_in}')
+
+        if fade_out > 0 and duration > 0:
+            filters.append(f'afade=t=out:st={duration - fade_out}:d={fade_out}')
+
+        if speed != 1.0:
+            filters.append(f'atempo={speed}')
+
+        return filters
+
+    @staticmethod
+    def build_encoder_args(
+        output_format: str = 'mp3',
+        bitrate: str = '320k',
+        sample_rate: int = 48000,
+        channels: int = 2
+    ) -> List[str]:
+        """Build FFmpeg codec and output arguments for the requested format"""
+        args = []
+
+        codec_map = {
+            'mp3': 'libmp3lame',
+            'm4a': 'aac',
+            'aac': 'aac',
+            'ogg': 'libvorbis',
+            'opus': 'libopus',
+            'flac': 'flac',
+            'wav': 'pcm_s16le',
+            'alac': 'alac',
+            'wma': 'wmav2',
+            'ac3': 'ac3',
+            'webm': 'libopus'
+        }
+
+        codec = codec_map.get(output_format.lower(), 'copy')
+        if codec != 'copy':
+            args.extend(['-c:a', codec])
+
+        lossless_formats = ['flac', 'wav', 'alac', 'ape', 'wv', 'tta', 'aiff']
+        if output_format.lower() not in lossless_formats:
+            args.extend(['-b:a', bitrate])
+
+        args.extend(['-ar', str(sample_rate)])
+        args.extend(['-ac', str(channels)])
+
+        if output_format.lower() == 'mp3':
+            args.extend(['-q:a', '0'])
+        elif output_format.lower() in ['aac', 'm4a']:
+            args.extend(['-movflags', '+faststart'])
+        elif output_format.lower() == 'flac':
+            args.extend(['-compression_level', '8'])
+
+        return args
+
     @staticmethod
     async def convert_audio(
-        input_file: str,
+        input_file: Union[str, np.ndarray, AsyncIterator[np.ndarray]],
         output_file: str,
         output_format: str = 'mp3',
         bitrate: str = '320k',
@@ -256,82 +1031,401 @@ class AdvancedAudioProcessor:
         normalize: bool = False,
         fade_in: float = 0,
         fade_out: float = 0,
-        speed: float = 1.0
+        speed: float = 1.0,
+        input_sample_rate: int = 48000,
+        input_channels: int = 2,
+        duration: float = 0,
+        audio_info: Optional[Dict] = None
     ) -> bool:
-        """Enhanced audio conversion with FFmpeg"""
+        """
+        Enhanced audio conversion with FFmpeg
+        input_file may also be a (channels, frames) float32 array or an async
+        iterator of such blocks; PCM is then piped into FFmpeg's stdin at
+        input_sample_rate/input_channels, so no intermediate file is written
+        duration: known input length in seconds, skips probing for fade_out;
+        required for fade_out with iterator input, which cannot be probed
+        audio_info: metadata from get_audio_info, reused instead of re-probing
+        """
         try:
-            cmd = ['ffmpeg', '-i', input_file, '-y']
-
-            filters = []
-
-            if bass_boost > 0:
-                filters.append(f'equalizer=f=100:width_type=h:width=200:g={bass_boost}')
-
-            if normalize:
-                filters.append('loudnorm=I=-16:TP=-1.5:LRA=11')
-
-            if fade_in > 0:
-                filters.append(f'afade=t=in:st=0:d={fade_in}')
-
-            if fade_out > 0:
-                info = await AdvancedAudioProcessor.get_audio_info(input_file)
-                duration = info.get('duration', 0)
-                if duration > 0:
-                    filters.append(f'afade=t=out:st={duration - fade_out}:d={fade_out}')
-
-            if speed != 1.0:
-                filters.append(f'atempo={speed}')
-
-            if filters:
-                cmd.extend(['-af', ','.join(filters)])
-
-            codec_map = {
-                'mp3': 'libmp3lame',
-                'm4a': 'aac',
-                'aac': 'aac',
-                'ogg': 'libvorbis',
-                'opus': 'libopus',
-                'flac': 'flac',
-                'wav': 'pcm_s16le',
-                'alac': 'alac',
-                'wma': 'wmav2',
-                'ac3': 'ac3',
-                'webm': 'libopus'
-            }
+            from_file = isinstance(input_file, str)
 
-            codec = codec_map.get(output_format.lower(), 'copy')
-            if codec != 'copy':
-                cmd.extend(['-c:a', codec])
+            if from_file:
+                cmd = ['ffmpeg', '-i', input_file, '-y']
+            else:
+                if isinstance(input_file, np.ndarray):
+                    input_file = np.atleast_2d(input_file)
+                    input_channels = input_file.shape[0]
+                    duration = duration or input_file.shape[1] / input_sample_rate
+                cmd = ['ffmpeg']
+                cmd.extend(AdvancedAudioProcessor.pcm_input_args(input_sample_rate, input_channels))
+                cmd.append('-y')
 
-            lossless_formats = ['flac', 'wav', 'alac', 'ape', 'wv', 'tta', 'aiff']
-            if output_format.lower() not in lossless_formats:
-                cmd.extend(['-b:a', bitrate])
+            if fade_out > 0 and not duration:
+                if from_file:
+                    info = audio_info or await AdvancedAudioProcessor.get_audio_info(input_file)
+                    duration = info.get('duration', 0)
+                else:
+                    logger.warning("Skipping fade_out for %s: streamed input needs a duration", output_file)
 
-            cmd.extend(['-ar', str(sample_rate)])
-            cmd.extend(['-ac', str(channels)])
+            filters = AdvancedAudioProcessor.build_filter_chain(
+                bass_boost, normalize, fade_in, fade_out, speed, duration
+            )
 
-            if output_format.lower() == 'mp3':
-                cmd.extend(['-q:a', '0'])
-            elif output_format.lower() in ['aac', 'm4a']:
-                cmd.extend(['-movflags', '+faststart'])
-            elif output_format.lower() == 'flac':
-                cmd.extend(['-compression_level', '8'])
+            path = 'transcode'
+            if from_file and not filters:
+                info = audio_info or await AdvancedAudioProcessor.get_audio_info(input_file)
+                path = AdvancedAudioProcessor.plan_conversion(
+                    info, output_format, bitrate, sample_rate, channels
+                )
 
+            if path != 'transcode':
+                cmd.extend(['-c:a', 'copy'])
+                if output_format.lower() in ['aac', 'm4a']:
+                    cmd.extend(['-movflags', '+faststart'])
+            else:
+                if filters:
+                    cmd.extend(['-af', ','.join(filters)])
+
+                cmd.extend(AdvancedAudioProcessor.build_encoder_args(
+                    output_format, bitrate, sample_rate, channels
+                ))
             cmd.append(output_file)
 
+            AdvancedAudioProcessor.conversion_stats[path] += 1
+            logger.info("Conversion path for %s: %s", output_file, path)
+
+            if from_file:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+
+                await process.communicate()
+                return process.returncode == 0
+
             process = await asyncio.create_subprocess_exec(
                 *cmd,
-                stdout=asyncio.subprocess.PIPE,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
                 stderr=asyncio.subprocess.PIPE
             )
+            stderr_task = asyncio.create_task(process.stderr.read())
 
-            await process.communicate()
-            return process.returncode == 0
+            try:
+                await AdvancedAudioProcessor._feed_pcm(process.stdin, input_file)
+            except (BrokenPipeError, ConnectionResetError):
+                logger.warning("Encoder closed its input early")
+            except BaseException:
+                # The source failed or we were cancelled: don't leave the
+                # encoder running or a truncated file behind
+                process.stdin.close()
+                if process.returncode is None:
+                    process.kill()
+                await process.wait()
+                stderr_task.cancel()
+                await asyncio.gather(stderr_task, return_exceptions=True)
+                if os.path.exists(output_file):
+                    os.remove(output_file)
+                raise
+            finally:
+                process.stdin.close()
+
+            stderr = await stderr_task
+            await process.wait()
+
+            if process.returncode != 0:
+                logger.error("Encoder failed: %s", stderr.decode(errors='ignore')[-500:])
+                if os.path.exists(output_file):
+                    os.remove(output_file)
+                return False
+            return True
 
         except Exception as e:
+            if AdvancedAudioProcessor.is_transient(e):
+                raise
             logger.exception("Error converting audio")
             return False
 
+    @staticmethod
+    async def _feed_pcm(
+        stdin: asyncio.StreamWriter,
+        source: Union[np.ndarray, AsyncIterator[np.ndarray]]
+    ):
+        """Write PCM into an encoder, waiting on drain() for backpressure"""
+        chunk_size = 1024 * 1024
+
+        async def write(block: np.ndarray):
+            data = AdvancedAudioProcessor.interleave(block)
+            for offset in range(0, len(data), chunk_size):
+                stdin.write(data[offset:offset + chunk_size])
+                await stdin.drain()
+
+        if isinstance(source, np.ndarray):
+            await write(source)
+        else:
+            async for block in source:
+                await write(block)
+
+    @staticmethod
+    def plan_conversion(
+        audio_info: Dict,
+        output_format: str,
+        bitrate: str = '320k',
+        sample_rate: int = 48000,
+        channels: int = 2
+    ) -> str:
+        """
+        Choose how convert_audio produces the output when no filters apply
+        'copy': same codec and container, stream copy
+        'remux': same codec, different container (e.g. m4a <-> aac), stream copy
+        'transcode': full decode and re-encode
+        Lossy streams are only copied when their bitrate does not exceed the
+        requested one, since re-encoding up cannot add quality
+        """
+        output_format = output_format.lower()
+        expected = AdvancedAudioProcessor.STREAM_CODECS.get(output_format)
+
+        if not audio_info or not expected or audio_info.get('codec') != expected:
+            return 'transcode'
+        if audio_info.get('sample_rate') != sample_rate or audio_info.get('channels') != channels:
+            return 'transcode'
+
+        lossless_formats = ['flac', 'wav', 'alac', 'ape', 'wv', 'tta', 'aiff']
+        if output_format not in lossless_formats:
+            requested = AdvancedAudioProcessor.parse_bitrate(bitrate)
+            current = audio_info.get('bitrate', 0)
+            if not requested or not current or current > requested:
+                return 'transcode'
+
+        container = AdvancedAudioProcessor.CONTAINER_FORMATS.get(output_format)
+        if container and container in audio_info.get('format', '').split(','):
+            return 'copy'
+        return 'remux'
+
+    @staticmethod
+    def parse_bitrate(bitrate: str) -> int:
+        """Parse '320k' style bitrates to kbps (0 when unparseable)"""
+        try:
+            value = str(bitrate).strip().lower()
+            if value.endswith('k'):
+                return int(float(value[:-1]))
+            return int(float(value)) // 1000
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def fast_path_hit_rate() -> float:
+        """Share of file conversions served by stream copy or remux"""
+        stats = AdvancedAudioProcessor.conversion_stats
+        total = sum(stats.values())
+        return (stats['copy'] + stats['remux']) / total if total else 0.0
+
+    @staticmethod
+    def needs_dsp(settings: Dict) -> bool:
+        """Check whether settings require the in-memory DSP stages"""
+        return bool(settings.get('eq') or settings.get('effects') or settings.get('normalize'))
+
+    @staticmethod
+    def use_streaming(
+        input_file: str,
+        streaming: Optional[bool] = None,
+        sample_rate: int = 48000,
+        audio_info: Optional[Dict] = None
+    ) -> bool:
+        """
+        Decide between block streaming and whole-file processing
+        Judged by the decoded float32 size at sample_rate, not the compressed
+        file size; inputs of unknown length are streamed
+        """
+        if streaming is not None:
+            return streaming
+        info = audio_info or AdvancedAudioProcessor.probe_sync(input_file)
+        duration = info.get('duration') or 0
+        if duration <= 0:
+            return True
+        decoded_bytes = duration * sample_rate * (info.get('channels') or 2) * 4
+        return decoded_bytes >= Config.STREAMING_THRESHOLD_BYTES
+
+    @staticmethod
+    def iter_processed_blocks(
+        audio_file,
+        board: Pedalboard,
+        sample_rate: int,
+        block_size: int = 0
+    ) -> Iterator[np.ndarray]:
+        """
+        Read, process and yield fixed-size blocks from an open reader
+        Plugin state (filter history, reverb tails) is carried across blocks
+        """
+        block_size = block_size or Config.STREAMING_BLOCK_FRAMES
+        board.reset()
+
+        while True:
+            block = audio_file.read(block_size)
+            if block.shape[-1] == 0:
+                break
+            if len(board) > 0:
+                block = board(block, sample_rate, reset=False)
+            yield block
+
+    @staticmethod
+    def _stream_process(
+        input_file: str,
+        output_file: str,
+        board: Pedalboard,
+        sample_rate: int
+    ):
+        """Run a board over a file block by block with bounded memory"""
+        with AdvancedAudioProcessor.open_reader(input_file, sample_rate) as f:
+            with AudioFile(output_file, 'w', sample_rate, f.num_channels) as out:
+                for block in AdvancedAudioProcessor.iter_processed_blocks(f, board, sample_rate):
+                    out.write(block)
+
+    @staticmethod
+    def pcm_input_args(sample_rate: int, num_channels: int) -> List[str]:
+        """FFmpeg input arguments for interleaved f32le PCM on stdin"""
+        return [
+            '-f', 'f32le', '-ar', str(sample_rate),
+            '-ac', str(num_channels), '-i', 'pipe:0'
+        ]
+
+    @staticmethod
+    def interleave(block: np.ndarray) -> memoryview:
+        """Byte view of a (channels, frames) block in interleaved float32 layout"""
+        pcm = np.ascontiguousarray(np.atleast_2d(block).T, dtype=np.float32)
+        return memoryview(pcm).cast('B')
+
+    @staticmethod
+    async def render(
+        input_file: str,
+        output_file: str,
+        settings: Dict,
+        sample_rate: int = 48000,
+        target_lufs: float = -14.0,
+        streaming: Optional[bool] = None,
+        audio_info: Optional[Dict] = None
+    ) -> bool:
+        """
+        Render a session in a single pass: decode once, run EQ, effects and
+        loudness gain on one in-memory buffer, then pipe the result straight
+        into the FFmpeg encoder without intermediate WAV files
+        streaming: process in fixed-size blocks (None = decide by decoded size)
+        audio_info: metadata from get_audio_info, so workers never re-probe
+        """
+        return await AdvancedAudioProcessor._dispatch(
+            AdvancedAudioProcessor._render_sync,
+            input_file, output_file, settings, sample_rate, target_lufs, streaming, audio_info
+        )
+
+    @staticmethod
+    async def render_for_settings(
+        input_file: str,
+        output_file: str,
+        settings: Dict,
+        audio_info: Optional[Dict] = None
+    ) -> bool:
+        """
+        Render session settings, taking the DSP path only when they need it
+        Returns False when the input or settings cannot be rendered and
+        raises on transient failures (see is_transient)
+        """
+        if AdvancedAudioProcessor.needs_dsp(settings):
+            return await AdvancedAudioProcessor.render(
+                input_file, output_file, settings, audio_info=audio_info
+            )
+
+        return await AdvancedAudioProcessor.convert_audio(
+            input_file=input_file,
+            output_file=output_file,
+            output_format=settings.get('format', 'mp3'),
+            bitrate=settings.get('bitrate', '320k'),
+            sample_rate=settings.get('sample_rate', 48000),
+            channels=settings.get('channels', 2),
+            bass_boost=settings.get('bass_boost', 0),
+            normalize=False,
+            fade_in=settings.get('fade_in', 0),
+            fade_out=settings.get('fade_out', 0),
+            speed=settings.get('speed', 1.0),
+            audio_info=audio_info
+        )
+
+    @staticmethod
+    def _render_sync(
+        input_file: str,
+        output_file: str,
+        settings: Dict,
+        sample_rate: int = 48000,
+        target_lufs: float = -14.0,
+        streaming: Optional[bool] = None,
+        audio_info: Optional[Dict] = None
+    ) -> bool:
+        """Blocking implementation of render, run inside the DSP executor"""
+        try:
+            plugins = AdvancedAudioProcessor.build_eq_plugins(settings.get('eq') or [])
+            plugins += AdvancedAudioProcessor.build_effect_plugins(settings.get('effects') or [])
+            board = Pedalboard(plugins)
+
+            if AdvancedAudioProcessor.use_streaming(input_file, streaming, sample_rate, audio_info):
+                gain = np.float32(1.0)
+                if settings.get('normalize'):
+                    with AdvancedAudioProcessor.open_reader(input_file, sample_rate, audio_info=audio_info) as f:
+                        meter = StreamingLoudnessMeter(sample_rate, f.num_channels)
+                        for block in AdvancedAudioProcessor.iter_processed_blocks(f, board, sample_rate):
+                            meter.process(block)
+                    gain = np.float32(AdvancedAudioProcessor.loudness_gain(
+                        meter.integrated_loudness(), target_lufs
+                    ))
+
+                with AdvancedAudioProcessor.open_reader(input_file, sample_rate, audio_info=audio_info) as f:
+                    num_frames = f.frames
+                    encoder = PCMEncoder(
+                        output_file, settings, sample_rate, f.num_channels, num_frames / sample_rate
+                    )
+                    try:
+                        for block in AdvancedAudioProcessor.iter_processed_blocks(f, board, sample_rate):
+                            encoder.write(block * gain)
+                    except Exception:
+                        encoder.abort()
+                        raise
+                    success = encoder.close()
+            else:
+                audio = AdvancedAudioProcessor.decode_pcm(input_file, sample_rate, audio_info=audio_info)
+
+                if plugins:
+                    audio = board(audio, sample_rate)
+
+                if settings.get('normalize') and audio.shape[1] >= int(0.4 * sample_rate):
+                    loudness = pyln.Meter(sample_rate).integrated_loudness(audio.T)
+                    if np.isfinite(loudness):
+                        audio *= np.float32(10.0 ** ((target_lufs - loudness) / 20.0))
+
+                num_frames = audio.shape[1]
+                encoder = PCMEncoder(
+                    output_file, settings, sample_rate, audio.shape[0], num_frames / sample_rate
+                )
+                try:
+                    encoder.write(audio)
+                except Exception:
+                    encoder.abort()
+                    raise
+                success = encoder.close()
+
+            if not success:
+                return False
+
+            logger.info(
+                "Rendered %s in one pass (%d frames, %d plugins, normalize=%s)",
+                output_file, num_frames, len(plugins), bool(settings.get('normalize'))
+            )
+            return True
+
+        except Exception as e:
+            if AdvancedAudioProcessor.is_transient(e):
+                raise
+            logger.exception("Error rendering audio")
+            return False
+
     @staticmethod
     def format_duration(seconds: float) -> str:
         """Format duration in human-readable format"""
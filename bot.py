@@ -7,8 +7,9 @@ import os
 import asyncio
 import logging
 import re
+import weakref
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 from pyrogram import filters
 from pyrogram.types import Message, CallbackQuery
@@ -18,9 +19,14 @@ from client import PnProjects
 from config import Config
 from buttons import Buttons, HelpTexts
 from forcesub import ForceSubscription
-from database import DatabaseManager, InMemorySessionManager
+from database import DatabaseManager
+from session_store import SessionStore
 from audio_processor import AdvancedAudioProcessor
 from download_manager import DownloadManager
+from result_cache import ResultCache, UploadRegistry
+from input_store import InputStore
+from storage_manager import StorageManager
+from job_queue import JobQueue
 
 logging.basicConfig(
     level=logging.INFO,
@@ -31,81 +37,157 @@ logger = logging.getLogger(__name__)
 bot = PnProjects()
 
 db = DatabaseManager()
-fallback_sessions = InMemorySessionManager()
 
 
-async def get_user_session(user_id: int) -> Dict:
-    """Get or create user session from database or memory"""
-    if db.is_connected:
-        session = await db.get_user_session(user_id)
-        if session:
-            return session
+def release_session_files(user_id: int, session: Dict):
+    """Expiry hook: give the session's input back to the shared store"""
+    if session.get('file_path'):
+        input_store.release_path(session['file_path'], user_id)
+
+
+session_store = SessionStore.from_config(db, on_expire=release_session_files)
+result_cache = ResultCache()
+upload_registry = UploadRegistry()
+input_store = InputStore()
+storage_manager = StorageManager(result_cache, input_store)
+job_queue = JobQueue(db)
+
+# Storage reservations and inputs held for queued renders until they are delivered
+_job_reservations: Dict[str, int] = {}
+_job_inputs: Dict[str, str] = {}
+
+
+def job_holder(job_id: str) -> str:
+    """Input store lease key for a queued render"""
+    return f"job:{job_id}"
+
+
+def hold_job_inputs():
+    """Renew the input leases of queued renders this process is waiting on"""
+    for job_id, input_file in _job_inputs.items():
+        input_store.hold(input_file, job_holder(job_id), Config.JOB_DELIVERY_LEASE_SECONDS)
+
+
+def release_job(job: Dict):
+    """Give back a finished job's storage reservation and input lease"""
+    storage_manager.release(_job_reservations.pop(job['id'], None))
+    _job_inputs.pop(job['id'], None)
+    input_file = (job.get('payload') or {}).get('input_file')
+    if input_file:
+        input_store.release_hold(input_file, job_holder(job['id']))
+
+
+# Per-user locks for read-modify-write sequences, and in-flight session loads
+# shared by concurrent callers (rapid double taps fetch once)
+_session_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+_session_loads: Dict[int, asyncio.Task] = {}
+
+
+def user_lock(user_id: int) -> asyncio.Lock:
+    """Lock serializing session changes for one user"""
+    lock = _session_locks.get(user_id)
+    if lock is None:
+        lock = _session_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+async def _load_user_session(user_id: int) -> Dict:
+    session = await session_store.get(user_id)
+    if session:
+        return session
+
+    new_session = await session_store.create(user_id)
+    return new_session if new_session else SessionStore.default_session(user_id)
 
-        new_session = await db.create_user_session(user_id)
-        return new_session if new_session else _create_default_session(user_id)
-    else:
-        session = fallback_sessions.get_session(user_id)
-        if session:
-            return session
-        return fallback_sessions.create_session(user_id)
+
+def _forget_session_load(user_id: int, load: Optional[asyncio.Task] = None):
+    if load is None or _session_loads.get(user_id) is load:
+        _session_loads.pop(user_id, None)
+
+
+def hold_session_input(user_id: int, session: Dict):
+    """Keep the session's input leased for as long as the session is in use"""
+    file_unique_id = (session.get('file_info') or {}).get('file_unique_id')
+    if file_unique_id and session.get('file_path'):
+        input_store.touch(file_unique_id, user_id)
+
+
+async def get_user_session(user_id: int) -> Dict:
+    """Get or create user session; concurrent callers share one load"""
+    load = _session_loads.get(user_id)
+    if load is None:
+        load = asyncio.ensure_future(_load_user_session(user_id))
+        _session_loads[user_id] = load
+        load.add_done_callback(lambda done: _forget_session_load(user_id, done))
+    session = await asyncio.shield(load)
+    hold_session_input(user_id, session)
+    return session
 
 
 async def update_user_session(user_id: int, updates: Dict) -> bool:
     """Update user session"""
-    if db.is_connected:
-        session = await db.get_user_session(user_id)
-        if session:
-            return await db.update_user_session(session['id'], updates)
-        return False
-    else:
-        return fallback_sessions.update_session(user_id, updates)
+    _forget_session_load(user_id)
+    return await session_store.update(user_id, updates)
+
+
+async def update_user_settings(user_id: int, patch: Dict) -> bool:
+    """Merge a partial settings change into the user's session"""
+    _forget_session_load(user_id)
+    return await session_store.update_settings(user_id, patch)
+
+
+async def modify_user_settings(
+    user_id: int,
+    change: Callable[[Dict], Optional[Dict]]
+) -> Optional[Dict]:
+    """
+    Read-modify-write the user's settings under their lock
+    change(settings) returns a patch to apply, or None to leave them as is
+    """
+    async with user_lock(user_id):
+        session = await get_user_session(user_id)
+        patch = change(session.get('settings') or {})
+        if patch:
+            await update_user_settings(user_id, patch)
+        return patch
 
 
 async def delete_user_session(user_id: int):
     """Delete user session and cleanup files"""
-    if db.is_connected:
-        session = await db.get_user_session(user_id)
+    async with user_lock(user_id):
+        _forget_session_load(user_id)
+        session = await session_store.get(user_id)
         if session:
-            file_path = session.get('file_path')
-            if file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception:
-                    pass
-            await db.delete_user_session(session['id'])
-    else:
-        session = fallback_sessions.get_session(user_id)
-        if session:
-            file_path = session.get('file_path')
-            if file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception:
-                    pass
-            fallback_sessions.delete_session(user_id)
-
-
-def _create_default_session(user_id: int) -> Dict:
-    """Create default session structure"""
-    return {
-        'user_id': user_id,
-        'file_path': None,
-        'original_filename': None,
-        'file_info': {},
-        'settings': {
-            'format': 'mp3',
-            'bitrate': '320k',
-            'sample_rate': 48000,
-            'channels': 2,
-            'bass_boost': 0,
-            'normalize': False,
-            'fade_in': 0,
-            'fade_out': 0,
-            'speed': 1.0,
-            'eq': [],
-            'effects': []
-        }
-    }
+            if session.get('file_path'):
+                input_store.release_path(session['file_path'], user_id)
+            await session_store.delete(user_id)
+
+
+def storage_rejection_text() -> str:
+    """User-facing reason for the last refused storage reservation"""
+    if storage_manager.last_rejection == StorageManager.TOO_LARGE:
+        return "This file is too large for the server's storage limits."
+    if storage_manager.last_rejection == StorageManager.USER_QUOTA:
+        return (
+            "You're using all of your storage right now. "
+            "Wait for your current files to finish or /cancel, then try again."
+        )
+    return "Server storage is full right now. Please try again in a few minutes."
+
+
+async def get_input_id(user_id: int, session: Dict) -> str:
+    """Stable identity of the session's input file for result caching"""
+    file_info = session.get('file_info') or {}
+
+    if file_info.get('file_unique_id'):
+        return f"tg:{file_info['file_unique_id']}"
+
+    if not file_info.get('content_hash'):
+        file_info['content_hash'] = await asyncio.to_thread(
+            ResultCache.hash_file, session['file_path']
+        )
+        await update_user_session(user_id, {'file_info': file_info})
+    return f"sha256:{file_info['content_hash']}"
 
 
 async def cleanup_expired_sessions():
@@ -114,10 +196,10 @@ async def cleanup_expired_sessions():
         try:
             await asyncio.sleep(Config.CLEANUP_INTERVAL_SECONDS)
 
-            if db.is_connected:
-                await db.cleanup_expired_sessions()
-            else:
-                fallback_sessions.cleanup_expired()
+            await session_store.cleanup_expired()
+
+            input_store.sweep()
+            storage_manager.sweep_orphans()
 
         except Exception as e:
             logger.exception("Error in cleanup task")
@@ -239,10 +321,7 @@ async def eq_command(client: PnProjects, message: Message):
             await message.reply_text("No valid EQ settings found.")
             return
 
-        settings = session.get('settings', {})
-        settings['eq'] = eq_settings
-
-        await update_user_session(user_id, {'settings': settings})
+        await update_user_settings(user_id, {'eq': eq_settings})
 
         eq_summary = '\n'.join([
             f"- {eq['freq']}Hz: {eq['gain']:+.1f}dB"
@@ -288,25 +367,48 @@ async def handle_audio(client: PnProjects, message: Message):
             return
 
         timestamp = int(datetime.now().timestamp())
+        stored = input_store.acquire(file.file_unique_id, user_id)
 
-        file_path = await DownloadManager.download_with_progress(
-            client, message, status_msg, user_id, timestamp
-        )
+        if stored:
+            logger.info("Reusing stored input %s for user %s", file.file_unique_id, user_id)
+            file_path = stored['path']
+            audio_info = stored['info'] or await AdvancedAudioProcessor.get_audio_info(file_path)
+        else:
+            # Inputs are decoded through a pipe, so only the file itself lands on disk
+            reservation = storage_manager.reserve(user_id, file.file_size)
+            if reservation is None:
+                await status_msg.edit_text(storage_rejection_text())
+                return
 
-        if not file_path:
-            await status_msg.edit_text("Download failed. Please try again.")
-            return
+            try:
+                file_path = await DownloadManager.download_with_progress(
+                    client, message, status_msg, user_id, timestamp
+                )
+            finally:
+                storage_manager.release(reservation)
+
+            if not file_path:
+                await status_msg.edit_text("Download failed. Please try again.")
+                return
 
-        audio_info = await AdvancedAudioProcessor.get_audio_info(file_path)
+            audio_info = await AdvancedAudioProcessor.get_audio_info(file_path)
+            file_path = input_store.add(file.file_unique_id, file_path, user_id, audio_info)
+
+        audio_info['file_unique_id'] = file.file_unique_id
 
         original_filename = getattr(file, 'file_name', f'audio_{timestamp}')
 
-        session = await get_user_session(user_id)
-        await update_user_session(user_id, {
-            'file_path': file_path,
-            'original_filename': original_filename,
-            'file_info': audio_info
-        })
+        async with user_lock(user_id):
+            session = await get_user_session(user_id)
+            previous_file = session.get('file_path')
+            if previous_file and previous_file != file_path:
+                input_store.release_path(previous_file, user_id)
+
+            await update_user_session(user_id, {
+                'file_path': file_path,
+                'original_filename': original_filename,
+                'file_info': audio_info
+            })
 
         info_text = f"""
 **Audio File Received**
@@ -456,9 +558,7 @@ async def handle_format_selection(callback_query: CallbackQuery, data: str, user
         return
 
     format_code = data.replace("format_", "")
-    await update_user_session(user_id, {
-        'settings': {'format': format_code}
-    })
+    await update_user_settings(user_id, {'format': format_code})
 
     await callback_query.answer(f"Format set to {format_code.upper()}")
     await callback_query.message.edit_text(
@@ -473,9 +573,8 @@ async def handle_bitrate_selection(callback_query: CallbackQuery, data: str, use
     bitrate = data.replace("bitrate_", "")
     session = await get_user_session(user_id)
     settings = session.get('settings', {})
-    settings['bitrate'] = bitrate
 
-    await update_user_session(user_id, {'settings': settings})
+    await update_user_settings(user_id, {'bitrate': bitrate})
     await callback_query.answer(f"Bitrate set to {bitrate}")
 
     await callback_query.message.edit_text(
@@ -490,52 +589,136 @@ async def handle_bitrate_selection(callback_query: CallbackQuery, data: str, use
 async def handle_sample_rate_selection(callback_query: CallbackQuery, data: str, user_id: int):
     """Handle sample rate selection"""
     sample = data.replace("sample_", "")
-    session = await get_user_session(user_id)
-    settings = session.get('settings', {})
-    settings['sample_rate'] = int(sample)
-
-    await update_user_session(user_id, {'settings': settings})
+    await update_user_settings(user_id, {'sample_rate': int(sample)})
     await callback_query.answer(f"Sample rate set to {sample} Hz")
 
 
 async def handle_channel_selection(callback_query: CallbackQuery, data: str, user_id: int):
     """Handle channel selection"""
     channels = int(data.replace("channels_", ""))
-    session = await get_user_session(user_id)
-    settings = session.get('settings', {})
-    settings['channels'] = channels
-
-    await update_user_session(user_id, {'settings': settings})
+    await update_user_settings(user_id, {'channels': channels})
     await callback_query.answer(f"Channels set to {channels}")
 
 
 async def handle_bass_boost_selection(callback_query: CallbackQuery, data: str, user_id: int):
     """Handle bass boost selection"""
     boost = int(data.replace("bass_", ""))
-    session = await get_user_session(user_id)
-    settings = session.get('settings', {})
-    settings['bass_boost'] = boost
-
-    await update_user_session(user_id, {'settings': settings})
+    await update_user_settings(user_id, {'bass_boost': boost})
     await callback_query.answer(f"Bass boost set to +{boost} dB")
 
 
 async def handle_effect_selection(callback_query: CallbackQuery, data: str, user_id: int):
     """Handle effect selection"""
     effect = data.replace("effect_", "")
-    session = await get_user_session(user_id)
-    settings = session.get('settings', {})
 
-    effects = settings.get('effects', [])
-    if effect not in effects:
-        effects.append(effect)
-        settings['effects'] = effects
-        await update_user_session(user_id, {'settings': settings})
+    def add_effect(settings: Dict) -> Optional[Dict]:
+        effects = settings.get('effects') or []
+        if effect not in effects:
+            return {'effects': effects + [effect]}
+        return None
+
+    if await modify_user_settings(user_id, add_effect):
         await callback_query.answer(f"{effect.title()} added")
     else:
         await callback_query.answer(f"{effect.title()} already added")
 
 
+def build_result_caption(settings: Dict, file_size: int) -> str:
+    """Caption for a processed file"""
+    caption = f"""
+**Processing Complete**
+
+**Settings Used:**
+Format: `{settings.get('format', 'mp3').upper()}`
+Bitrate: `{settings.get('bitrate', '320k')}`
+Sample Rate: `{settings.get('sample_rate', 48000)} Hz`
+Size: `{AdvancedAudioProcessor.format_size(file_size)}`
+"""
+
+    if settings.get('eq'):
+        caption += f"\nEQ Bands: `{len(settings['eq'])}`"
+    if settings.get('effects'):
+        caption += f"\nEffects: `{', '.join(settings['effects'])}`"
+    return caption
+
+
+async def send_uploaded_output(
+    client: PnProjects,
+    callback_query: CallbackQuery,
+    input_id: str,
+    settings_hash: str,
+    settings: Dict
+) -> bool:
+    """Resend a previously uploaded output by file_id, skipping render and upload"""
+    if db.is_connected:
+        uploaded = await db.get_uploaded_output(input_id, settings_hash)
+    else:
+        uploaded = upload_registry.get(input_id, settings_hash)
+
+    if not uploaded:
+        return False
+
+    try:
+        await client.send_audio(
+            chat_id=callback_query.message.chat.id,
+            audio=uploaded['file_id'],
+            caption=build_result_caption(settings, uploaded.get('file_size') or 0)
+        )
+        logger.info("Reused uploaded output %s|%s", input_id, settings_hash[:12])
+        return True
+    except Exception:
+        logger.warning("Stored file_id no longer usable, rendering again", exc_info=True)
+        if db.is_connected:
+            await db.delete_uploaded_output(input_id, settings_hash)
+        else:
+            upload_registry.delete(input_id, settings_hash)
+        return False
+
+
+async def save_uploaded_output(input_id: str, settings_hash: str, file_id: str, file_size: int):
+    """Remember an uploaded output's file_id for repeat requests"""
+    if db.is_connected:
+        await db.save_uploaded_output(input_id, settings_hash, file_id, file_size)
+    else:
+        upload_registry.save(input_id, settings_hash, file_id, file_size)
+
+
+async def upload_output(
+    client: PnProjects,
+    chat_id: int,
+    output_file: str,
+    settings: Dict,
+    input_id: str,
+    settings_hash: str,
+    cache_key: str,
+    file_name: str,
+    from_cache: bool = False
+):
+    """Cache a rendered file, upload it and remember its file_id"""
+    output_format = settings.get('format', 'mp3')
+    if not from_cache:
+        cached_file = result_cache.put(cache_key, output_format, output_file)
+        if cached_file:
+            output_file = cached_file
+            from_cache = True
+
+    try:
+        file_size = os.path.getsize(output_file)
+        sent = await client.send_audio(
+            chat_id=chat_id,
+            audio=output_file,
+            caption=build_result_caption(settings, file_size),
+            file_name=file_name
+        )
+
+        media = (sent.audio or sent.document) if sent else None
+        if media:
+            await save_uploaded_output(input_id, settings_hash, media.file_id, file_size)
+    finally:
+        if not from_cache and os.path.exists(output_file):
+            os.remove(output_file)
+
+
 async def process_audio(client: PnProjects, callback_query: CallbackQuery, user_id: int):
     """Process audio with configured settings"""
     session = await get_user_session(user_id)
@@ -551,96 +734,82 @@ async def process_audio(client: PnProjects, callback_query: CallbackQuery, user_
     settings = session.get('settings', {})
     timestamp = int(datetime.now().timestamp())
     output_format = settings.get('format', 'mp3')
+    file_name = f"{user_id}_{timestamp}_output.{output_format}"
 
     try:
         await callback_query.message.edit_text("Processing audio... Please wait.")
 
-        temp_files = []
+        input_id = await get_input_id(user_id, session)
+        settings_hash = ResultCache.settings_hash(settings)
 
-        current_file = input_file
-
-        if settings.get('eq'):
-            eq_file = f"downloads/{user_id}_{timestamp}_eq.wav"
-            success = await AdvancedAudioProcessor.apply_eq(
-                current_file, eq_file, settings['eq']
-            )
-            if success:
-                current_file = eq_file
-                temp_files.append(eq_file)
-            else:
-                await callback_query.message.edit_text("EQ processing failed.")
-                return
-
-        if settings.get('effects'):
-            effects_file = f"downloads/{user_id}_{timestamp}_effects.wav"
-            success = await AdvancedAudioProcessor.apply_pedalboard_effects(
-                current_file, effects_file, settings['effects']
-            )
-            if success:
-                current_file = effects_file
-                temp_files.append(effects_file)
-
-        if settings.get('normalize'):
-            norm_file = f"downloads/{user_id}_{timestamp}_norm.wav"
-            success = await AdvancedAudioProcessor.normalize_audio(
-                current_file, norm_file
+        if await send_uploaded_output(client, callback_query, input_id, settings_hash, settings):
+            await callback_query.message.edit_text(
+                "**Processing Complete**\n\n"
+                "Your file has been sent above.\n\n"
+                "Want to do more with this file?",
+                reply_markup=Buttons.continue_or_cancel()
             )
-            if success:
-                current_file = norm_file
-                temp_files.append(norm_file)
-
-        output_file = f"downloads/{user_id}_{timestamp}_output.{output_format}"
-
-        success = await AdvancedAudioProcessor.convert_audio(
-            input_file=current_file,
-            output_file=output_file,
-            output_format=output_format,
-            bitrate=settings.get('bitrate', '320k'),
-            sample_rate=settings.get('sample_rate', 48000),
-            channels=settings.get('channels', 2),
-            bass_boost=settings.get('bass_boost', 0),
-            normalize=False,
-            fade_in=settings.get('fade_in', 0),
-            fade_out=settings.get('fade_out', 0),
-            speed=settings.get('speed', 1.0)
-        )
-
-        if not success or not os.path.exists(output_file):
-            await callback_query.message.edit_text("Processing failed. Try different settings.")
-            for f in temp_files:
-                if os.path.exists(f):
-                    os.remove(f)
             return
 
-        await callback_query.message.edit_text("Uploading processed audio...")
+        cache_key = ResultCache.make_key(input_id, settings)
+        output_file = result_cache.get(cache_key, output_format)
+        from_cache = output_file is not None
 
-        file_size = os.path.getsize(output_file)
-        caption = f"""
-**Processing Complete**
+        if from_cache:
+            logger.info("Result cache hit for user %s (%s)", user_id, cache_key[:12])
+        else:
+            reservation = storage_manager.reserve(user_id, StorageManager.estimate_output_bytes(
+                (session.get('file_info') or {}).get('duration', 0), settings
+            ))
+            if reservation is None:
+                await callback_query.message.edit_text(storage_rejection_text())
+                return
 
-**Settings Used:**
-Format: `{output_format.upper()}`
-Bitrate: `{settings.get('bitrate', '320k')}`
-Sample Rate: `{settings.get('sample_rate', 48000)} Hz`
-Size: `{AdvancedAudioProcessor.format_size(file_size)}`
-"""
+            output_file = f"downloads/{file_name}"
+
+            if job_queue.enabled:
+                job_id = await job_queue.enqueue(user_id, {
+                    'chat_id': callback_query.message.chat.id,
+                    'message_id': callback_query.message.id,
+                    'input_file': input_file,
+                    'output_file': output_file,
+                    'file_name': file_name,
+                    'settings': settings,
+                    'audio_info': session.get('file_info') or None,
+                    'input_id': input_id,
+                    'settings_hash': settings_hash,
+                    'cache_key': cache_key
+                })
+                if job_id:
+                    _job_reservations[job_id] = reservation
+                    _job_inputs[job_id] = input_file
+                    input_store.hold(input_file, job_holder(job_id), Config.JOB_DELIVERY_LEASE_SECONDS)
+                    await callback_query.message.edit_text(
+                        "Queued for processing... You'll get the file here when it's ready."
+                    )
+                    return
+                logger.warning("Could not queue render for user %s, rendering inline", user_id)
+
+            try:
+                success = await AdvancedAudioProcessor.render_for_settings(
+                    input_file, output_file, settings,
+                    audio_info=session.get('file_info') or None
+                )
+            finally:
+                storage_manager.release(reservation)
 
-        if settings.get('eq'):
-            caption += f"\nEQ Bands: `{len(settings['eq'])}`"
-        if settings.get('effects'):
-            caption += f"\nEffects: `{', '.join(settings['effects'])}`"
+            if not success or not os.path.exists(output_file):
+                await callback_query.message.edit_text("Processing failed. Try different settings.")
+                if os.path.exists(output_file):
+                    os.remove(output_file)
+                return
 
-        await client.send_audio(
-            chat_id=callback_query.message.chat.id,
-            audio=output_file,
-            caption=caption
-        )
+        await callback_query.message.edit_text("Uploading processed audio...")
 
-        if os.path.exists(output_file):
-            os.remove(output_file)
-        for f in temp_files:
-            if os.path.exists(f):
-                os.remove(f)
+        await upload_output(
+            client, callback_query.message.chat.id, output_file, settings,
+            input_id, settings_hash, cache_key, file_name, from_cache=from_cache
+        )
 
         await callback_query.message.edit_text(
             "**Processing Complete**\n\n"
@@ -654,12 +823,113 @@ Size: `{AdvancedAudioProcessor.format_size(file_size)}`
         await callback_query.message.edit_text(f"Error: {str(e)}")
 
 
+async def edit_job_message(client: PnProjects, payload: Dict, text: str, **kwargs):
+    """Best-effort status edit for a queued job; never blocks its delivery"""
+    try:
+        await client.edit_message_text(payload['chat_id'], payload['message_id'], text, **kwargs)
+    except Exception as e:
+        logger.debug("Job status edit failed: %s", e)
+
+
+async def deliver_job(client: PnProjects, job: Dict):
+    """
+    Upload a worker's render, or report its failure, to the user
+    Raises if the upload fails, so the job stays queued for another try
+    """
+    payload = job.get('payload') or {}
+    settings = payload.get('settings') or {}
+    result = job.get('result') or {}
+
+    output_file = result.get('output_file')
+    from_cache = False
+    if job.get('status') == 'completed' and not (output_file and os.path.exists(output_file)):
+        # An earlier delivery attempt already moved it into the result cache
+        output_file = result_cache.get(payload['cache_key'], settings.get('format', 'mp3'))
+        from_cache = output_file is not None
+
+    if job.get('status') != 'completed' or not output_file:
+        logger.warning("Render job %s failed: %s", job['id'], job.get('error_message'))
+        await edit_job_message(client, payload, "Processing failed. Try different settings.")
+        return
+
+    logger.info(
+        "Delivering job %s (queued %.1fs, rendered in %.1fs, %d attempts)",
+        job['id'], result.get('wait_seconds', 0), result.get('render_seconds', 0),
+        job.get('attempts', 1)
+    )
+    await edit_job_message(client, payload, "Uploading processed audio...")
+
+    await upload_output(
+        client, payload['chat_id'], output_file, settings,
+        payload['input_id'], payload['settings_hash'], payload['cache_key'],
+        payload.get('file_name') or os.path.basename(output_file),
+        from_cache=from_cache
+    )
+
+    await edit_job_message(
+        client, payload,
+        "**Processing Complete**\n\n"
+        "Your file has been sent above.\n\n"
+        "Want to do more with this file?",
+        reply_markup=Buttons.continue_or_cancel()
+    )
+
+
+async def deliver_finished_jobs():
+    """
+    Background task to upload renders finished by queue workers
+    A job is removed from the queue only after its delivery succeeded or
+    ran out of attempts; if the bot dies mid-delivery the lease lapses and
+    the job is delivered on a later poll
+    """
+    while True:
+        try:
+            await asyncio.sleep(Config.JOB_POLL_INTERVAL_SECONDS)
+            hold_job_inputs()
+
+            for job in await job_queue.take_finished():
+                try:
+                    await deliver_job(bot, job)
+                except Exception:
+                    logger.exception("Error delivering job %s", job.get('id'))
+                    if job.get('delivery_attempts', 1) < Config.JOB_MAX_ATTEMPTS:
+                        await job_queue.retry_delivery(job)
+                        continue
+
+                    logger.error("Giving up on delivering job %s", job.get('id'))
+                    await edit_job_message(
+                        bot, job.get('payload') or {},
+                        "Could not send the processed file. Please try again."
+                    )
+                    output_file = (job.get('result') or {}).get('output_file')
+                    if output_file and os.path.exists(output_file):
+                        os.remove(output_file)
+
+                release_job(job)
+                await job_queue.delivered(job)
+
+        except Exception as e:
+            logger.exception("Error in job delivery task")
+
+
+async def shutdown():
+    """Write pending session changes, then close the database pool"""
+    await session_store.close()
+    await db.close()
+
+
 if __name__ == "__main__":
     logger.info("=" * 50)
     logger.info("Starting %s...", Config.BOT_NAME)
     logger.info("=" * 50)
 
+    storage_manager.sweep_orphans()
+
     loop = asyncio.get_event_loop()
     loop.create_task(cleanup_expired_sessions())
+    if job_queue.enabled:
+        logger.info("Renders go through the processing queue")
+        loop.create_task(deliver_finished_jobs())
 
     bot.run()
+    loop.run_until_complete(shutdown())
@@ -6,6 +6,7 @@ Provides enhanced client functionality with custom name
 import logging
 from pyrogram import Client
 from config import Config
+from dsp_executor import DSPExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -46,4 +47,5 @@ class PnProjects(Client):
     async def stop(self, *args):
         """Stop the bot with cleanup"""
         await super().stop()
+        DSPExecutor.shutdown(wait=False)
         logger.info("✓ %s stopped successfully!", Config.BOT_NAME)
@@ -24,6 +24,9 @@ class Config:
     # Supabase Database (Optional - falls back to in-memory)
     SUPABASE_URL: Optional[str] = os.getenv("SUPABASE_URL", None)
     SUPABASE_ANON_KEY: Optional[str] = os.getenv("SUPABASE_ANON_KEY", None)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_TIMEOUT_SECONDS: float = float(os.getenv("DB_TIMEOUT_SECONDS", "5"))
+    DB_CONNECT_TIMEOUT_SECONDS: float = 3.0
 
     # Bot Settings
     BOT_NAME: str = "PnProjects Audio Bot"
@@ -33,15 +36,62 @@ class Config:
     DOWNLOAD_LOCATION: str = "./downloads"
     MAX_FILE_SIZE: int = 2000 * 1024 * 1024  # 2GB in bytes
 
+    # Download admission (global slots, per-user cap)
+    MAX_CONCURRENT_DOWNLOADS: int = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "8"))
+    MAX_DOWNLOADS_PER_USER: int = int(os.getenv("MAX_DOWNLOADS_PER_USER", "1"))
+
+    # Downloads above this size are fetched as parallel byte ranges
+    PARALLEL_DOWNLOAD_THRESHOLD_BYTES: int = 100 * 1024 * 1024
+    DOWNLOAD_PARALLEL_RANGES: int = int(os.getenv("DOWNLOAD_PARALLEL_RANGES", "4"))
+
     # Session Settings
     SESSION_TIMEOUT_MINUTES: int = 5
     CLEANUP_INTERVAL_SECONDS: int = 60
 
+    # Session backend: "auto" (Supabase if configured, else memory), "memory", "sqlite", "supabase"
+    SESSION_BACKEND: str = os.getenv("SESSION_BACKEND", "auto")
+    SESSION_DB_PATH: str = os.getenv("SESSION_DB_PATH", "./downloads/sessions.db")
+    SESSION_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("SESSION_FLUSH_INTERVAL_SECONDS", "1"))
+
+    # Status Message Edits (global budget across all chats, per-message spacing)
+    EDIT_RATE_PER_SECOND: float = float(os.getenv("EDIT_RATE_PER_SECOND", "20"))
+    EDIT_MIN_INTERVAL_SECONDS: float = 2.0
+
+    # Storage Budget for the downloads directory (0 disables a quota)
+    STORAGE_QUOTA_BYTES: int = int(os.getenv("STORAGE_QUOTA_MB", "20480")) * 1024 * 1024
+    USER_STORAGE_QUOTA_BYTES: int = int(os.getenv("USER_STORAGE_QUOTA_MB", "6144")) * 1024 * 1024
+    STORAGE_MIN_FREE_BYTES: int = int(os.getenv("STORAGE_MIN_FREE_MB", "1024")) * 1024 * 1024
+    ORPHAN_MAX_AGE_SECONDS: int = 3600
+    PART_FILE_MAX_AGE_SECONDS: int = 24 * 3600
+
+    # Shared Input Store (unreferenced downloads are kept this long for reuse)
+    INPUT_STORE_TTL_SECONDS: int = int(os.getenv("INPUT_STORE_TTL_MINUTES", "30")) * 60
+
     # Processing Settings
     DEFAULT_BITRATE: str = "320k"
     DEFAULT_SAMPLE_RATE: int = 48000
     DEFAULT_CHANNELS: int = 2
 
+    # DSP Worker Pool ("process" or "thread"; 0 workers = one per CPU core)
+    DSP_EXECUTOR_MODE: str = os.getenv("DSP_EXECUTOR_MODE", "process")
+    DSP_WORKERS: int = int(os.getenv("DSP_WORKERS", "0"))
+
+    # Render Job Queue (processing_queue in Supabase, run by worker.py processes)
+    PROCESSING_QUEUE_ENABLED: bool = os.getenv("PROCESSING_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+    JOB_HEARTBEAT_SECONDS: int = 10
+    JOB_STALE_SECONDS: int = int(os.getenv("JOB_STALE_SECONDS", "60"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    # A finished job taken for upload is offered again if not delivered within this
+    JOB_DELIVERY_LEASE_SECONDS: int = 900
+
+    # Rendered output cache under DOWNLOAD_LOCATION/cache (0 disables)
+    RESULT_CACHE_MAX_BYTES: int = int(os.getenv("RESULT_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+    # Files at or above this size are processed in fixed-size blocks
+    STREAMING_THRESHOLD_BYTES: int = int(os.getenv("STREAMING_THRESHOLD_MB", "100")) * 1024 * 1024
+    STREAMING_BLOCK_FRAMES: int = 65536
+
     # Supported Audio Formats
     SUPPORTED_FORMATS = [
         # Lossy formats
@@ -70,6 +120,23 @@ class Config:
 
         return True
 
+    @classmethod
+    def default_settings(cls) -> dict:
+        """Default audio processing settings for a new session"""
+        return {
+            'format': 'mp3',
+            'bitrate': cls.DEFAULT_BITRATE,
+            'sample_rate': cls.DEFAULT_SAMPLE_RATE,
+            'channels': cls.DEFAULT_CHANNELS,
+            'bass_boost': 0,
+            'normalize': False,
+            'fade_in': 0,
+            'fade_out': 0,
+            'speed': 1.0,
+            'eq': [],
+            'effects': []
+        }
+
     @classmethod
     def get_format_display_name(cls, format_code: str) -> str:
         """Get display name for audio format"""
@@ -4,20 +4,54 @@ Handles all database operations with Supabase for scalability
 """
 
 import os
+import time
+import heapq
 import logging
-from typing import Dict, Optional, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
-from supabase import create_client, Client
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
 from config import Config
+from models import Session
 
 logger = logging.getLogger(__name__)
 
 
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """
+    Async PostgREST client on one pooled HTTP/2 connection
+    A single httpx.AsyncClient is shared by every coroutine, so concurrent
+    handlers multiplex over the same connections instead of blocking
+    """
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            limits=httpx.Limits(
+                max_connections=Config.DB_POOL_SIZE,
+                max_keepalive_connections=Config.DB_POOL_SIZE
+            ),
+            follow_redirects=True,
+            http2=True
+        )
+
+
 class DatabaseManager:
     """Manages database operations for user sessions and processing queue"""
 
     _instance: Optional['DatabaseManager'] = None
-    _client: Optional[Client] = None
+    _client: Optional[PooledPostgrestClient] = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -34,7 +68,19 @@ class DatabaseManager:
                     logger.warning("Supabase credentials not found, using in-memory storage")
                     self._client = None
                 else:
-                    self._client = create_client(supabase_url, supabase_key)
+                    rest_url = os.getenv('SUPABASE_REST_URL') or f"{supabase_url.rstrip('/')}/rest/v1"
+                    self._client = PooledPostgrestClient(
+                        rest_url,
+                        headers={
+                            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+                            'apikey': supabase_key,
+                            'Authorization': f"Bearer {supabase_key}"
+                        },
+                        timeout=httpx.Timeout(
+                            Config.DB_TIMEOUT_SECONDS,
+                            connect=Config.DB_CONNECT_TIMEOUT_SECONDS
+                        )
+                    )
                     logger.info("Database connection established")
             except Exception as e:
                 logger.error("Failed to connect to database: %s", e)
@@ -45,13 +91,18 @@ class DatabaseManager:
         """Check if database is connected"""
         return self._client is not None
 
+    async def close(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+
     async def get_user_session(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get active session for user"""
         if not self.is_connected:
             return None
 
         try:
-            response = self._client.table('user_sessions') \
+            response = await self._client.table('user_sessions') \
                 .select('*') \
                 .eq('user_id', user_id) \
                 .gt('expires_at', datetime.utcnow().isoformat()) \
@@ -73,7 +124,10 @@ class DatabaseManager:
         original_filename: Optional[str] = None,
         file_info: Optional[Dict] = None
     ) -> Optional[Dict[str, Any]]:
-        """Create new user session"""
+        """
+        Create a fresh session for the user
+        Upserts on user_id, so an expired row left for the user is reset in place
+        """
         if not self.is_connected:
             return None
 
@@ -83,13 +137,14 @@ class DatabaseManager:
                 'file_path': file_path,
                 'original_filename': original_filename,
                 'file_info': file_info or {},
+                'settings': Config.default_settings(),
                 'created_at': datetime.utcnow().isoformat(),
                 'updated_at': datetime.utcnow().isoformat(),
-                'expires_at': (datetime.utcnow() + timedelta(minutes=5)).isoformat()
+                'expires_at': (datetime.utcnow() + timedelta(minutes=Config.SESSION_TIMEOUT_MINUTES)).isoformat()
             }
 
-            response = self._client.table('user_sessions') \
-                .insert(session_data) \
+            response = await self._client.table('user_sessions') \
+                .upsert(session_data, on_conflict='user_id') \
                 .execute()
 
             if response.data:
@@ -110,7 +165,7 @@ class DatabaseManager:
             return False
 
         try:
-            response = self._client.table('user_sessions') \
+            response = await self._client.table('user_sessions') \
                 .update(updates) \
                 .eq('id', session_id) \
                 .execute()
@@ -120,13 +175,44 @@ class DatabaseManager:
             logger.exception("Error updating session")
             return False
 
+    async def upsert_user_sessions(self, sessions: List[Dict[str, Any]]) -> bool:
+        """Write several sessions in one request, matched on user_id"""
+        if not self.is_connected or not sessions:
+            return False
+
+        try:
+            response = await self._client.table('user_sessions') \
+                .upsert(sessions, on_conflict='user_id') \
+                .execute()
+
+            return bool(response.data)
+        except Exception as e:
+            logger.exception("Error writing sessions")
+            return False
+
+    async def merge_session_settings(self, user_id: int, patch: Dict[str, Any]) -> bool:
+        """Merge a partial settings change into the active session server-side"""
+        if not self.is_connected:
+            return False
+
+        try:
+            response = await self._client.rpc(
+                'merge_session_settings',
+                {'p_user_id': user_id, 'p_patch': patch}
+            ).execute()
+
+            return bool(response.data)
+        except Exception as e:
+            logger.exception("Error merging session settings")
+            return False
+
     async def delete_user_session(self, session_id: str) -> bool:
         """Delete user session"""
         if not self.is_connected:
             return False
 
         try:
-            self._client.table('user_sessions') \
+            await self._client.table('user_sessions') \
                 .delete() \
                 .eq('id', session_id) \
                 .execute()
@@ -143,7 +229,7 @@ class DatabaseManager:
             return 0
 
         try:
-            response = self._client.table('user_sessions') \
+            response = await self._client.table('user_sessions') \
                 .delete() \
                 .lt('expires_at', datetime.utcnow().isoformat()) \
                 .execute()
@@ -162,8 +248,8 @@ class DatabaseManager:
             return False
 
         try:
-            new_expiry = (datetime.utcnow() + timedelta(minutes=5)).isoformat()
-            response = self._client.table('user_sessions') \
+            new_expiry = (datetime.utcnow() + timedelta(minutes=Config.SESSION_TIMEOUT_MINUTES)).isoformat()
+            response = await self._client.table('user_sessions') \
                 .update({
                     'updated_at': datetime.utcnow().isoformat(),
                     'expires_at': new_expiry
@@ -176,55 +262,299 @@ class DatabaseManager:
             logger.exception("Error extending session")
             return False
 
+    async def get_uploaded_output(
+        self,
+        input_id: str,
+        settings_hash: str
+    ) -> Optional[Dict[str, Any]]:
+        """Get a previously uploaded output for an input and settings"""
+        if not self.is_connected:
+            return None
 
-class InMemorySessionManager:
-    """Fallback in-memory session manager when database is not available"""
+        try:
+            response = await self._client.table('uploaded_outputs') \
+                .select('*') \
+                .eq('input_id', input_id) \
+                .eq('settings_hash', settings_hash) \
+                .limit(1) \
+                .execute()
 
-    def __init__(self):
-        self.sessions: Dict[int, Dict] = {}
+            if response.data:
+                return response.data[0]
+            return None
+        except Exception as e:
+            logger.exception("Error getting uploaded output")
+            return None
+
+    async def save_uploaded_output(
+        self,
+        input_id: str,
+        settings_hash: str,
+        file_id: str,
+        file_size: int = 0
+    ) -> bool:
+        """Remember the Telegram file_id of an uploaded output"""
+        if not self.is_connected:
+            return False
+
+        try:
+            response = await self._client.table('uploaded_outputs') \
+                .upsert({
+                    'input_id': input_id,
+                    'settings_hash': settings_hash,
+                    'file_id': file_id,
+                    'file_size': file_size,
+                    'created_at': datetime.utcnow().isoformat()
+                }) \
+                .execute()
+
+            return bool(response.data)
+        except Exception as e:
+            logger.exception("Error saving uploaded output")
+            return False
+
+    async def delete_uploaded_output(self, input_id: str, settings_hash: str) -> bool:
+        """Forget an uploaded output whose file_id stopped working"""
+        if not self.is_connected:
+            return False
+
+        try:
+            await self._client.table('uploaded_outputs') \
+                .delete() \
+                .eq('input_id', input_id) \
+                .eq('settings_hash', settings_hash) \
+                .execute()
+            return True
+        except Exception as e:
+            logger.exception("Error deleting uploaded output")
+            return False
+
+    async def enqueue_processing_job(
+        self,
+        user_id: int,
+        operation: str,
+        payload: Dict[str, Any],
+        max_attempts: int = 3
+    ) -> Optional[Dict[str, Any]]:
+        """Add a pending job to the processing queue"""
+        if not self.is_connected:
+            return None
+
+        try:
+            response = await self._client.table('processing_queue') \
+                .insert({
+                    'user_id': user_id,
+                    'operation': operation,
+                    'payload': payload,
+                    'max_attempts': max_attempts
+                }) \
+                .execute()
+
+            if response.data:
+                return response.data[0]
+            return None
+        except Exception as e:
+            logger.exception("Error enqueuing processing job")
+            return None
+
+    async def claim_processing_job(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Claim the oldest pending job for a worker"""
+        if not self.is_connected:
+            return None
+
+        try:
+            response = await self._client.rpc(
+                'claim_processing_job',
+                {'p_worker_id': worker_id}
+            ).execute()
+
+            if response.data:
+                return response.data[0]
+            return None
+        except Exception as e:
+            logger.exception("Error claiming processing job")
+            return None
+
+    async def heartbeat_processing_job(self, job_id: str, worker_id: str) -> Optional[bool]:
+        """
+        Mark a claimed job as still being worked on
+        False if the claim was lost, None if the database could not be reached
+        """
+        if not self.is_connected:
+            return None
+
+        try:
+            response = await self._client.table('processing_queue') \
+                .update({'heartbeat_at': datetime.utcnow().isoformat()}) \
+                .eq('id', job_id) \
+                .eq('worker_id', worker_id) \
+                .eq('status', 'processing') \
+                .execute()
+
+            return bool(response.data)
+        except Exception as e:
+            logger.exception("Error updating job heartbeat")
+            return None
+
+    async def finish_processing_job(
+        self,
+        job_id: str,
+        worker_id: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error_message: Optional[str] = None
+    ) -> bool:
+        """
+        Record a worker's outcome for a claimed job
+        status is 'completed', 'failed', or 'pending' to retry it
+        """
+        if not self.is_connected:
+            return False
+
+        try:
+            response = await self._client.table('processing_queue') \
+                .update({
+                    'status': status,
+                    'result': result,
+                    'error_message': error_message,
+                    'worker_id': None,
+                    'completed_at': None if status == 'pending' else datetime.utcnow().isoformat()
+                }) \
+                .eq('id', job_id) \
+                .eq('worker_id', worker_id) \
+                .execute()
+
+            return bool(response.data)
+        except Exception as e:
+            logger.exception("Error finishing processing job")
+            return False
+
+    async def requeue_stale_processing_jobs(self, stale_seconds: int) -> int:
+        """Return jobs of unresponsive workers to the queue"""
+        if not self.is_connected:
+            return 0
+
+        try:
+            response = await self._client.rpc(
+                'requeue_stale_processing_jobs',
+                {'p_stale_seconds': stale_seconds}
+            ).execute()
+
+            count = response.data or 0
+            if count:
+                logger.warning("Recovered %d stale processing jobs", count)
+            return count
+        except Exception as e:
+            logger.exception("Error requeuing stale jobs")
+            return 0
+
+    async def take_finished_processing_jobs(
+        self,
+        limit: int = 20,
+        lease_seconds: int = 900
+    ) -> List[Dict[str, Any]]:
+        """Lease completed and failed jobs to the caller for delivery"""
+        if not self.is_connected:
+            return []
+
+        try:
+            response = await self._client.rpc(
+                'take_finished_processing_jobs',
+                {'p_limit': limit, 'p_lease_seconds': lease_seconds}
+            ).execute()
+
+            return response.data or []
+        except Exception as e:
+            logger.exception("Error taking finished jobs")
+            return []
+
+    async def release_processing_job_delivery(self, job_id: str) -> bool:
+        """Give up a delivery lease so the job is retried on the next poll"""
+        if not self.is_connected:
+            return False
+
+        try:
+            response = await self._client.table('processing_queue') \
+                .update({'delivering_at': None}) \
+                .eq('id', job_id) \
+                .execute()
+
+            return bool(response.data)
+        except Exception as e:
+            logger.exception("Error releasing job delivery")
+            return False
+
+    async def delete_processing_job(self, job_id: str) -> bool:
+        """Remove a delivered job"""
+        if not self.is_connected:
+            return False
+
+        try:
+            await self._client.table('processing_queue') \
+                .delete() \
+                .eq('id', job_id) \
+                .execute()
+            return True
+        except Exception as e:
+            logger.exception("Error deleting processing job")
+            return False
+
+
+class InMemorySessionManager:
+    """
+    Fallback in-memory session manager when database is not available
+    Sessions are kept as slotted Session objects with interned settings
+    and handed out as plain dicts. Expiry times sit in a min-heap, so a
+    cleanup pass only touches sessions that actually expired; entries
+    superseded by a later update are skipped when they surface.
+    on_expire(user_id, session) runs for every session that lapses, so its
+    files can be released right away
+    """
+
+    def __init__(self, on_expire: Optional[Callable[[int, Dict], None]] = None):
+        self.sessions: Dict[int, Session] = {}
+        self.on_expire = on_expire
+        self._expiry_heap: List[Tuple[float, int]] = []
+
+    def _schedule_expiry(self, user_id: int):
+        heapq.heappush(self._expiry_heap, (self.sessions[user_id].expires_at, user_id))
+
+    def _expire(self, user_id: int):
+        session = self.sessions.pop(user_id)
+        if self.on_expire:
+            try:
+                self.on_expire(user_id, session.to_dict())
+            except Exception:
+                logger.exception("Error in session expiry callback")
 
     def get_session(self, user_id: int) -> Optional[Dict]:
         """Get user session from memory"""
         session = self.sessions.get(user_id)
-        if session and session.get('expires_at', datetime.min) > datetime.utcnow():
-            return session
+        if session and session.expires_at > time.time():
+            return session.to_dict()
         elif session:
-            del self.sessions[user_id]
+            self._expire(user_id)
         return None
 
     def create_session(self, user_id: int, **kwargs) -> Dict:
         """Create new session in memory"""
-        session = {
-            'user_id': user_id,
-            'file_path': kwargs.get('file_path'),
-            'original_filename': kwargs.get('original_filename'),
-            'file_info': kwargs.get('file_info', {}),
-            'settings': {
-                'format': 'mp3',
-                'bitrate': '320k',
-                'sample_rate': 48000,
-                'channels': 2,
-                'bass_boost': 0,
-                'normalize': False,
-                'fade_in': 0,
-                'fade_out': 0,
-                'speed': 1.0,
-                'eq': [],
-                'effects': []
-            },
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow(),
-            'expires_at': datetime.utcnow() + timedelta(minutes=5)
-        }
+        session = Session(
+            user_id,
+            file_path=kwargs.get('file_path'),
+            original_filename=kwargs.get('original_filename'),
+            file_info=kwargs.get('file_info')
+        )
         self.sessions[user_id] = session
-        return session
+        self._schedule_expiry(user_id)
+        return session.to_dict()
 
     def update_session(self, user_id: int, updates: Dict) -> bool:
-        """Update session in memory"""
-        if user_id in self.sessions:
-            self.sessions[user_id].update(updates)
-            self.sessions[user_id]['updated_at'] = datetime.utcnow()
-            self.sessions[user_id]['expires_at'] = datetime.utcnow() + timedelta(minutes=5)
+        """Update session in memory; settings updates are patches"""
+        session = self.sessions.get(user_id)
+        if session:
+            session.update(updates)
+            session.touch()
+            self._schedule_expiry(user_id)
             return True
         return False
 
@@ -235,11 +565,21 @@ class InMemorySessionManager:
             return True
         return False
 
+    def seconds_until_next_expiry(self) -> Optional[float]:
+        """Time to the earliest pending expiry (possibly a superseded entry), or None"""
+        if not self._expiry_heap:
+            return None
+        return max(0.0, self._expiry_heap[0][0] - time.time())
+
     def cleanup_expired(self) -> int:
-        """Clean up expired sessions"""
-        now = datetime.utcnow()
-        expired = [uid for uid, sess in self.sessions.items()
-                   if sess.get('expires_at', datetime.min) < now]
-        for uid in expired:
-            del self.sessions[uid]
-        return len(expired)
+        """Clean up expired sessions in O(expired log n)"""
+        now = time.time()
+        count = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, user_id = heapq.heappop(self._expiry_heap)
+            session = self.sessions.get(user_id)
+            if session is None or session.expires_at != expires_at:
+                continue
+            self._expire(user_id)
+            count += 1
+        return count
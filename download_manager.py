@@ -4,9 +4,11 @@ Robust file downloading with retry logic and progress tracking
 """
 
 import os
+import json
+import math
 import logging
 import asyncio
-from typing import Optional
+from typing import Awaitable, Callable, List, Optional
 from datetime import datetime
 from pyrogram import Client
 from pyrogram.types import Message
@@ -17,6 +19,10 @@ from tenacity import (
     retry_if_exception_type
 )
 from pyrogram.errors import FloodWait
+from config import Config
+from audio_processor import StreamingProbe
+from edit_scheduler import EditScheduler
+from download_scheduler import DownloadScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +30,9 @@ logger = logging.getLogger(__name__)
 class DownloadManager:
     """Manages file downloads with retry and progress tracking"""
 
+    CHUNK_SIZE = 1024 * 1024  # stream_media chunk size
+    CHECKPOINT_CHUNKS = 8  # fsync and record progress every 8 MB
+
     @staticmethod
     @retry(
         stop=stop_after_attempt(5),
@@ -34,17 +43,23 @@ class DownloadManager:
         client: Client,
         message: Message,
         file_name: str,
-        progress_callback=None
+        progress_callback=None,
+        part_path: Optional[str] = None,
+        head_callback: Optional[Callable[[int, bytes], Awaitable[None]]] = None
     ) -> Optional[str]:
         """
         Download file with automatic retry on failure
+        Each attempt resumes from the last chunk recorded on disk
         Returns path to downloaded file or None
         """
         try:
-            file_path = await client.download_media(
+            file_path = await DownloadManager.download_resumable(
+                client,
                 message,
-                file_name=file_name,
-                progress=progress_callback
+                file_name,
+                progress_callback,
+                part_path,
+                head_callback
             )
 
             if file_path and os.path.exists(file_path):
@@ -63,6 +78,155 @@ class DownloadManager:
             logger.exception("Download error")
             raise
 
+    @staticmethod
+    def get_media(message: Message):
+        """Return the audio/voice/document attached to a message"""
+        return message.audio or message.voice or message.document
+
+    @staticmethod
+    def part_path_for(message: Message, user_id: int) -> str:
+        """
+        Stable partial-download path for a user's file
+        Independent of the upload timestamp so a restart can resume it
+        """
+        media = DownloadManager.get_media(message)
+        return os.path.join('downloads', f"{user_id}_{media.file_unique_id}.part")
+
+    @staticmethod
+    def _plan_ranges(file_size: int) -> List[List[int]]:
+        """
+        Split a file into [start_chunk, end_chunk, next_chunk] ranges
+        Files above PARALLEL_DOWNLOAD_THRESHOLD_BYTES get several ranges
+        """
+        total_chunks = max(1, math.ceil(file_size / DownloadManager.CHUNK_SIZE))
+        count = 1
+        if file_size >= Config.PARALLEL_DOWNLOAD_THRESHOLD_BYTES:
+            count = max(1, min(Config.DOWNLOAD_PARALLEL_RANGES, total_chunks))
+
+        bounds = [total_chunks * i // count for i in range(count + 1)]
+        return [[bounds[i], bounds[i + 1], bounds[i]] for i in range(count)]
+
+    @staticmethod
+    def _load_part_state(state_path: str, file_unique_id: str, file_size: int) -> Optional[List[List[int]]]:
+        """Ranges recorded for this file, or None if missing or stale"""
+        try:
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if state.get('file_unique_id') != file_unique_id or state.get('size') != file_size:
+            return None
+        return state.get('ranges') or None
+
+    @staticmethod
+    def _save_part_state(state_path: str, file_unique_id: str, file_size: int, ranges: List[List[int]]):
+        temp_path = f"{state_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'file_unique_id': file_unique_id, 'size': file_size, 'ranges': ranges}, f)
+        os.replace(temp_path, state_path)
+
+    @staticmethod
+    async def download_resumable(
+        client: Client,
+        message: Message,
+        file_name: str,
+        progress_callback=None,
+        part_path: Optional[str] = None,
+        head_callback: Optional[Callable[[int, bytes], Awaitable[None]]] = None
+    ) -> Optional[str]:
+        """
+        Chunked download through stream_media into a preallocated .part file
+        Large files are split into byte ranges fetched concurrently and
+        written with positional writes. A sidecar JSON records how far each
+        range got, so a retry or a bot restart continues from the last good
+        chunk of every range
+        head_callback receives (offset, bytes) for the file's leading range
+        in order as it arrives, for analysis that overlaps the download
+        """
+        media = DownloadManager.get_media(message)
+        file_size = media.file_size
+        part_path = part_path or f"{file_name}.part"
+        state_path = f"{part_path}.json"
+
+        ranges = DownloadManager._load_part_state(state_path, media.file_unique_id, file_size)
+        if ranges and (not os.path.exists(part_path) or os.path.getsize(part_path) != file_size):
+            ranges = None
+
+        if ranges:
+            logger.info("Resuming %s (%d ranges)", part_path, len(ranges))
+        else:
+            ranges = DownloadManager._plan_ranges(file_size)
+            os.makedirs(os.path.dirname(part_path) or '.', exist_ok=True)
+            with open(part_path, 'wb') as f:
+                f.truncate(file_size)
+            DownloadManager._save_part_state(state_path, media.file_unique_id, file_size, ranges)
+
+        downloaded = sum(
+            min((r[2] - r[0]) * DownloadManager.CHUNK_SIZE, file_size - r[0] * DownloadManager.CHUNK_SIZE)
+            for r in ranges
+        )
+        unsynced = 0
+        head_range = ranges[0]
+
+        if head_callback and head_range[2] > head_range[0]:
+            with open(part_path, 'rb') as f:
+                await head_callback(0, f.read(min(
+                    (head_range[2] - head_range[0]) * DownloadManager.CHUNK_SIZE,
+                    StreamingProbe.HEAD_BYTES
+                )))
+
+        fd = os.open(part_path, os.O_RDWR)
+
+        def checkpoint():
+            os.fsync(fd)
+            DownloadManager._save_part_state(state_path, media.file_unique_id, file_size, ranges)
+
+        async def fetch(byte_range: List[int]):
+            nonlocal downloaded, unsynced
+            start, end, next_chunk = byte_range
+            if next_chunk >= end:
+                return
+
+            async for chunk in client.stream_media(message, offset=next_chunk, limit=end - next_chunk):
+                position = byte_range[2] * DownloadManager.CHUNK_SIZE
+                os.pwrite(fd, chunk, position)
+                byte_range[2] += 1
+                downloaded += len(chunk)
+                unsynced += 1
+
+                if head_callback and byte_range is head_range:
+                    await head_callback(position, chunk)
+
+                if unsynced >= DownloadManager.CHECKPOINT_CHUNKS:
+                    unsynced = 0
+                    checkpoint()
+
+                if progress_callback:
+                    await progress_callback(downloaded, file_size)
+
+        tasks = [asyncio.create_task(fetch(r)) for r in ranges]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Stop sibling ranges before the fd is closed (and its number reused)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            checkpoint()
+            os.close(fd)
+
+        missing = [r for r in ranges if r[2] < r[1]]
+        if missing:
+            raise ConnectionError(f"Incomplete download: {len(missing)} ranges unfinished")
+
+        os.replace(part_path, file_name)
+        try:
+            os.remove(state_path)
+        except OSError:
+            pass
+        return file_name
+
     @staticmethod
     async def download_with_progress(
         client: Client,
@@ -76,30 +240,20 @@ class DownloadManager:
         Returns downloaded file path or None
         """
 
-        last_update_time = 0
+        probe = None
 
         async def progress(current, total):
-            nonlocal last_update_time
-            current_time = asyncio.get_event_loop().time()
-
-            if current_time - last_update_time < 2:
-                return
-
-            last_update_time = current_time
-
             percentage = current * 100 / total
             progress_bar = DownloadManager._create_progress_bar(percentage)
 
-            try:
-                await status_message.edit_text(
-                    f"Downloading file...\n\n"
-                    f"{progress_bar}\n"
-                    f"Progress: {percentage:.1f}%\n"
-                    f"Size: {DownloadManager._format_bytes(current)} / "
-                    f"{DownloadManager._format_bytes(total)}"
-                )
-            except Exception:
-                pass
+            EditScheduler.submit(
+                status_message,
+                f"Downloading file...\n\n"
+                f"{progress_bar}\n"
+                f"Progress: {percentage:.1f}%\n"
+                f"Size: {DownloadManager._format_bytes(current)} / "
+                f"{DownloadManager._format_bytes(total)}"
+            )
 
         try:
             if message.audio:
@@ -121,19 +275,38 @@ class DownloadManager:
                 f"{user_id}_{timestamp}_input.{file_ext}"
             )
 
-            file_path = await DownloadManager.download_with_retry(
-                client,
-                message,
-                download_path,
-                progress
-            )
+            def queued(position: int):
+                EditScheduler.submit(
+                    status_message,
+                    f"Waiting for a download slot...\n\n"
+                    f"Queue position: {position}"
+                )
 
+            async with DownloadScheduler.slot(user_id, queued):
+                probe = StreamingProbe()
+                file_path = await DownloadManager.download_with_retry(
+                    client,
+                    message,
+                    download_path,
+                    progress,
+                    DownloadManager.part_path_for(message, user_id),
+                    probe.feed
+                )
+
+            EditScheduler.forget(status_message)
             if file_path:
                 await status_message.edit_text("Download complete! Analyzing audio...")
+                if await probe.finish(file_path, os.path.getsize(file_path)):
+                    logger.info("Audio info ready from streaming probe: %s", file_path)
+            else:
+                probe.abort()
 
             return file_path
 
         except Exception as e:
+            if probe is not None:
+                probe.abort()
+            EditScheduler.forget(status_message)
             logger.exception("Error in download with progress")
             await status_message.edit_text(
                 f"Download failed: {str(e)}\n\n"
@@ -0,0 +1,122 @@
+"""
+Download Scheduler for PnProjects Audio Bot
+Global admission control with per-user caps and round-robin fairness
+"""
+
+import asyncio
+import logging
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadScheduler:
+    """
+    Admits downloads into a fixed number of global slots
+    Waiting downloads are queued per user and users are served round-robin,
+    so one user sending many files cannot starve everyone else
+    """
+
+    _queues: Dict[int, Deque[asyncio.Future]] = {}
+    _last_served: Dict[int, int] = {}
+    _served_count: int = 0
+    _active_total: int = 0
+    _active_per_user: Counter = Counter()
+
+    @classmethod
+    def _service_order(cls) -> List[int]:
+        """Waiting users, least recently served first (newcomers lead)"""
+        return sorted(cls._queues, key=lambda user_id: cls._last_served.get(user_id, 0))
+
+    @classmethod
+    def _dispatch(cls):
+        """Grant free slots to waiting downloads in round-robin user order"""
+        while cls._active_total < Config.MAX_CONCURRENT_DOWNLOADS:
+            for user_id in cls._service_order():
+                queue = cls._queues[user_id]
+                while queue and queue[0].done():
+                    queue.popleft()
+                if not queue:
+                    del cls._queues[user_id]
+                    if not cls._active_per_user[user_id]:
+                        cls._last_served.pop(user_id, None)
+                    continue
+                if cls._active_per_user[user_id] >= Config.MAX_DOWNLOADS_PER_USER:
+                    continue
+
+                queue.popleft().set_result(None)
+                cls._active_total += 1
+                cls._active_per_user[user_id] += 1
+                cls._served_count += 1
+                cls._last_served[user_id] = cls._served_count
+                break
+            else:
+                return
+
+    @classmethod
+    def position(cls, user_id: int, ticket: asyncio.Future) -> int:
+        """1-based place of a waiting download in round-robin service order"""
+        queues = [[t for t in cls._queues[uid] if not t.done()] for uid in cls._service_order()]
+        place = 0
+        for depth in range(max((len(q) for q in queues), default=0)):
+            for queue in queues:
+                if depth < len(queue):
+                    place += 1
+                    if queue[depth] is ticket:
+                        return place
+        return 0
+
+    @classmethod
+    def _release(cls, user_id: int):
+        cls._active_total -= 1
+        cls._active_per_user[user_id] -= 1
+        if cls._active_per_user[user_id] <= 0:
+            del cls._active_per_user[user_id]
+            if user_id not in cls._queues:
+                cls._last_served.pop(user_id, None)
+        cls._dispatch()
+
+    @classmethod
+    @asynccontextmanager
+    async def slot(
+        cls,
+        user_id: int,
+        on_wait: Optional[Callable[[int], None]] = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold a download slot for the duration of the block
+        on_wait is called with the current queue position while waiting
+        """
+        ticket = asyncio.get_running_loop().create_future()
+        cls._queues.setdefault(user_id, deque()).append(ticket)
+        cls._dispatch()
+
+        try:
+            while not ticket.done():
+                if on_wait:
+                    on_wait(cls.position(user_id, ticket))
+                await asyncio.wait({ticket}, timeout=Config.EDIT_MIN_INTERVAL_SECONDS)
+        except BaseException:
+            if ticket.done() and not ticket.cancelled():
+                cls._release(user_id)
+            else:
+                ticket.cancel()
+                cls._dispatch()
+            raise
+
+        try:
+            yield
+        finally:
+            cls._release(user_id)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Active and waiting download counts"""
+        return {
+            'active': cls._active_total,
+            'waiting': sum(len(queue) for queue in cls._queues.values()),
+            'users_waiting': len(cls._queues)
+        }
@@ -0,0 +1,83 @@
+"""
+DSP Executor for PnProjects Audio Bot
+Runs blocking audio processing off the event loop in a managed worker pool
+"""
+
+import os
+import logging
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class DSPExecutor:
+    """Shared worker pool for CPU-bound DSP jobs"""
+
+    _executor: Optional[Executor] = None
+
+    @classmethod
+    def get_executor(cls) -> Executor:
+        """
+        Create the worker pool lazily
+        Thread mode avoids pickling overhead and works well because
+        Pedalboard releases the GIL while plugins run. Process workers are
+        started from a forkserver (spawn where unavailable), never forked
+        from the bot, so they don't inherit its event loop, sockets or locks
+        """
+        if cls._executor is None:
+            workers = Config.DSP_WORKERS or os.cpu_count() or 1
+            mode = Config.DSP_EXECUTOR_MODE.lower()
+
+            if mode == "thread":
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix="dsp"
+                )
+            else:
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                context = multiprocessing.get_context(method)
+                if method == 'forkserver':
+                    context.set_forkserver_preload(['audio_processor'])
+                cls._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+            logger.info("DSP executor started: %s pool with %d workers", mode, workers)
+        return cls._executor
+
+    @classmethod
+    async def run(cls, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking function in the pool and await its result
+        In process mode func and its arguments must be picklable. If a
+        pool worker died (e.g. OOM-killed), the pool is rebuilt for later
+        jobs and BrokenProcessPool raised; the job is not resubmitted, since
+        it may well be what killed the worker
+        """
+        loop = asyncio.get_running_loop()
+        executor = cls.get_executor()
+        try:
+            return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+        except BrokenProcessPool:
+            logger.warning("DSP worker pool broken, restarting it")
+            cls._reset(executor)
+            raise
+
+    @classmethod
+    def _reset(cls, executor: Executor):
+        """Drop a broken pool unless another job already replaced it"""
+        if cls._executor is executor:
+            cls._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def shutdown(cls, wait: bool = True):
+        """Stop the worker pool"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=wait, cancel_futures=True)
+            cls._executor = None
+            logger.info("DSP executor stopped")
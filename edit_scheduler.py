@@ -0,0 +1,131 @@
+"""
+Edit Scheduler for PnProjects Audio Bot
+Coalesces progress message edits across all chats under one global rate budget
+"""
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from pyrogram.types import Message
+from pyrogram.errors import FloodWait, MessageNotModified
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class EditScheduler:
+    """
+    Shared sender for status message edits
+    Only the latest pending text per message is kept, messages are served
+    round-robin once their minimum interval has passed, sends are spaced to
+    a global per-second budget, and a FloodWait pauses every edit
+    """
+
+    _pending: "OrderedDict[Tuple[int, int], Tuple[Message, str]]" = OrderedDict()
+    _last_text: Dict[Tuple[int, int], str] = {}
+    _last_sent: Dict[Tuple[int, int], float] = {}
+    _paused_until: float = 0.0
+    # Message whose edit is awaiting Telegram; cleared by forget() mid-send
+    _sending: Optional[Tuple[int, int]] = None
+    _wake: Optional[asyncio.Event] = None
+    _task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(message: Message) -> Tuple[int, int]:
+        return message.chat.id, message.id
+
+    @classmethod
+    def submit(cls, message: Message, text: str):
+        """Queue text for a message, replacing any edit still waiting"""
+        key = cls._key(message)
+
+        if cls._last_text.get(key) == text:
+            cls._pending.pop(key, None)
+            return
+
+        cls._pending[key] = (message, text)
+
+        if cls._task is None or cls._task.done():
+            cls._wake = asyncio.Event()
+            cls._task = asyncio.create_task(cls._run())
+        cls._wake.set()
+
+    @classmethod
+    def forget(cls, message: Message):
+        """
+        Drop pending edits and history for a message
+        Call before editing it directly so a queued update cannot overwrite it
+        """
+        key = cls._key(message)
+        cls._pending.pop(key, None)
+        cls._last_text.pop(key, None)
+        cls._last_sent.pop(key, None)
+        if cls._sending == key:
+            cls._sending = None
+
+    @classmethod
+    def _next_due(cls, now: float) -> Tuple[Optional[Tuple[int, int]], float]:
+        """First message in round-robin order that may be edited, or the wait until one can"""
+        wait = float('inf')
+        for key in cls._pending:
+            ready_at = cls._last_sent.get(key, 0.0) + Config.EDIT_MIN_INTERVAL_SECONDS
+            if ready_at <= now:
+                return key, 0.0
+            wait = min(wait, ready_at - now)
+        return None, wait
+
+    @classmethod
+    async def _run(cls):
+        interval = 1.0 / max(Config.EDIT_RATE_PER_SECOND, 0.1)
+        next_slot = 0.0
+
+        while True:
+            if not cls._pending:
+                cls._wake.clear()
+                await cls._wake.wait()
+                continue
+
+            now = time.monotonic()
+            delay = max(cls._paused_until - now, next_slot - now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            key, wait = cls._next_due(now)
+            if key is None:
+                cls._wake.clear()
+                try:
+                    await asyncio.wait_for(cls._wake.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            message, text = cls._pending.pop(key)
+            next_slot = time.monotonic() + interval
+            cls._sending = key
+
+            try:
+                await message.edit_text(text)
+            except FloodWait as e:
+                logger.warning("FloodWait on message edit: pausing all edits for %s seconds", e.value)
+                cls._paused_until = time.monotonic() + e.value
+                if cls._sending == key and key not in cls._pending:
+                    cls._pending[key] = (message, text)
+                    cls._pending.move_to_end(key, last=False)
+                cls._sending = None
+                continue
+            except MessageNotModified:
+                pass
+            except Exception as e:
+                logger.debug("Progress edit failed: %s", e)
+                text = None
+
+            # Forgotten while the edit was in flight: keep no history for it
+            if cls._sending == key:
+                if text is not None:
+                    cls._last_text[key] = text
+                cls._last_sent[key] = time.monotonic()
+            cls._sending = None
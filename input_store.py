@@ -0,0 +1,274 @@
+"""
+Input Store for PnProjects Audio Bot
+Shared, refcounted store of downloaded inputs keyed by Telegram file_unique_id
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Dict, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class InputStore:
+    """
+    One local copy per Telegram file, shared by every session that uses it
+    Each session, and each queued render job, holds a lease on the entry;
+    the file is removed only once no lease is left and the entry has sat
+    unused for the TTL, so a quick resend or a forward from another user
+    skips the download entirely
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        lease_seconds: Optional[int] = None
+    ):
+        self.root = root or os.path.join(Config.DOWNLOAD_LOCATION, 'inputs')
+        self.ttl_seconds = Config.INPUT_STORE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.lease_seconds = lease_seconds or Config.SESSION_TIMEOUT_MINUTES * 60
+        self.index_path = os.path.join(self.root, 'index.json')
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Dict] = {}
+
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Restore entries whose files survived a restart"""
+        try:
+            with open(self.index_path, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logger.exception("Failed to load input store index")
+            return
+
+        for file_unique_id, entry in entries.items():
+            if os.path.exists(entry.get('path', '')):
+                entry.setdefault('size', os.path.getsize(entry['path']))
+                self._entries[file_unique_id] = entry
+
+        if self._entries:
+            logger.info("Input store loaded: %d files", len(self._entries))
+
+    def _persist(self):
+        temp_path = f"{self.index_path}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            logger.exception("Failed to persist input store index")
+
+    def _lease(self, entry: Dict, holder, lease_seconds: Optional[int] = None):
+        now = time.time()
+        entry['refs'][str(holder)] = now + (lease_seconds or self.lease_seconds)
+        entry['last_used'] = now
+
+    def _find_path(self, file_path: str) -> Optional[str]:
+        for file_unique_id, entry in self._entries.items():
+            if entry['path'] == file_path:
+                return file_unique_id
+        return None
+
+    def _live_entry(self, file_unique_id: str) -> Optional[Dict]:
+        entry = self._entries.get(file_unique_id)
+        if entry and not os.path.exists(entry['path']):
+            del self._entries[file_unique_id]
+            return None
+        return entry
+
+    def acquire(self, file_unique_id: str, user_id: int) -> Optional[Dict]:
+        """
+        Reference an existing local copy for a user's session
+        Returns {'path', 'info'} or None when the file has to be downloaded
+        """
+        entry = self._live_entry(file_unique_id)
+        if not entry:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._lease(entry, user_id)
+        self._persist()
+        return {'path': entry['path'], 'info': dict(entry.get('info') or {})}
+
+    def add(self, file_unique_id: str, source_path: str, user_id: int, info: Optional[Dict] = None) -> str:
+        """
+        Move a fresh download into the store and reference it
+        If another download of the same file landed first, the duplicate is
+        dropped and the existing copy is returned
+        """
+        existing = self._live_entry(file_unique_id)
+        if existing:
+            if os.path.abspath(source_path) != os.path.abspath(existing['path']):
+                try:
+                    os.remove(source_path)
+                except OSError:
+                    pass
+            self._lease(existing, user_id)
+            self._persist()
+            return existing['path']
+
+        ext = os.path.splitext(source_path)[1]
+        path = os.path.join(self.root, f"{file_unique_id}{ext}")
+        try:
+            os.replace(source_path, path)
+        except OSError:
+            logger.exception("Failed to move input into store")
+            return source_path
+
+        entry = {
+            'path': path,
+            'size': os.path.getsize(path),
+            'info': info or {},
+            'refs': {},
+            'last_used': 0
+        }
+        self._entries[file_unique_id] = entry
+        self._lease(entry, user_id)
+        self._persist()
+        return path
+
+    def touch(self, file_unique_id: str, user_id: int):
+        """
+        Renew a live session's lease, re-creating it if it already lapsed
+        (a sweep may have pruned it while the session sat idle)
+        """
+        entry = self._live_entry(file_unique_id)
+        if not entry:
+            return
+        lapsed = str(user_id) not in entry['refs']
+        self._lease(entry, user_id)
+        if lapsed:
+            self._persist()
+
+    def release(self, file_unique_id: str, user_id: int):
+        """Drop a session's reference; the file stays until the TTL runs out"""
+        entry = self._entries.get(file_unique_id)
+        if entry and entry['refs'].pop(str(user_id), None) is not None:
+            entry['last_used'] = time.time()
+            self._persist()
+
+    def release_path(self, file_path: str, user_id: int):
+        """
+        Release a session's input by path
+        Files that never went through the store are removed directly
+        """
+        file_unique_id = self._find_path(file_path)
+        if file_unique_id:
+            self.release(file_unique_id, user_id)
+            return
+
+        if os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+    def hold(self, file_path: str, holder: str, lease_seconds: Optional[int] = None) -> bool:
+        """
+        Lease a stored input to something other than a session, such as a
+        queued render job; call again to renew. Returns False for files
+        that never went through the store
+        """
+        file_unique_id = self._find_path(file_path)
+        entry = self._live_entry(file_unique_id) if file_unique_id else None
+        if not entry:
+            return False
+        lapsed = holder not in entry['refs']
+        self._lease(entry, holder, lease_seconds)
+        if lapsed:
+            self._persist()
+        return True
+
+    def release_hold(self, file_path: str, holder: str):
+        """Drop a hold taken with hold(); the file itself is left alone"""
+        file_unique_id = self._find_path(file_path)
+        if file_unique_id:
+            self.release(file_unique_id, holder)
+
+    def total_bytes(self) -> int:
+        """Bytes held by all stored inputs"""
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def user_bytes(self, user_id: int) -> int:
+        """Bytes of stored inputs a user currently references"""
+        key = str(user_id)
+        return sum(entry['size'] for entry in self._entries.values() if key in entry['refs'])
+
+    def evict_unreferenced(self, nbytes: int) -> int:
+        """
+        Delete unreferenced inputs, least recently used first, ignoring the TTL
+        An entry still holding any reference, even one whose lease lapsed
+        but has not been swept yet, belongs to a session or a queued job
+        and is never evicted. Stops once nbytes have been freed; returns
+        the bytes freed
+        """
+        idle = sorted(
+            (entry['last_used'], file_unique_id)
+            for file_unique_id, entry in self._entries.items()
+            if not entry['refs']
+        )
+
+        freed = 0
+        for _, file_unique_id in idle:
+            if freed >= nbytes:
+                break
+            entry = self._entries.pop(file_unique_id)
+            freed += entry['size']
+            try:
+                os.remove(entry['path'])
+            except OSError:
+                pass
+
+        if freed:
+            self._persist()
+            logger.info("Input store evicted %.1f MB under storage pressure", freed / (1024 * 1024))
+        return freed
+
+    def sweep(self) -> int:
+        """
+        Expire stale leases and delete unreferenced files past the TTL
+        Returns the number of files removed
+        """
+        now = time.time()
+        removed = 0
+
+        for file_unique_id in list(self._entries):
+            entry = self._entries[file_unique_id]
+            entry['refs'] = {uid: expires for uid, expires in entry['refs'].items() if expires > now}
+
+            if entry['refs'] or now - entry['last_used'] < self.ttl_seconds:
+                continue
+
+            del self._entries[file_unique_id]
+            removed += 1
+            try:
+                os.remove(entry['path'])
+            except OSError:
+                pass
+
+        self._persist()
+        if removed:
+            logger.info("Input store removed %d unused files", removed)
+        return removed
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current usage"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'files': len(self._entries),
+            'bytes': self.total_bytes(),
+            'referenced': sum(1 for entry in self._entries.values() if entry['refs'])
+        }
@@ -0,0 +1,116 @@
+"""
+Job Queue for PnProjects Audio Bot
+Durable render jobs in the Supabase processing_queue table
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Dict, List, Optional
+from config import Config
+from database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class JobFailed(Exception):
+    """A job that cannot succeed on retry (bad input or settings)"""
+
+
+class ClaimLost(Exception):
+    """The job was requeued to another worker while this one held it"""
+
+
+class JobQueue:
+    """
+    Render jobs shared by the bot and any number of worker processes
+    The bot enqueues one job per render and later leases finished jobs back
+    for upload, deleting each only once it is delivered. Workers claim
+    pending jobs with FOR UPDATE SKIP LOCKED and heartbeat while rendering;
+    a job whose worker goes quiet for JOB_STALE_SECONDS returns to the queue
+    until JOB_MAX_ATTEMPTS is spent
+    """
+
+    OPERATION = 'render'
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    @property
+    def enabled(self) -> bool:
+        """Queue renders only when switched on and the database is there"""
+        return Config.PROCESSING_QUEUE_ENABLED and self.db.is_connected
+
+    async def enqueue(self, user_id: int, payload: Dict) -> Optional[str]:
+        """Queue a render job and return its id"""
+        job = await self.db.enqueue_processing_job(
+            user_id, self.OPERATION, payload, Config.JOB_MAX_ATTEMPTS
+        )
+        if job:
+            logger.info("Queued render job %s for user %s", job['id'], user_id)
+            return job['id']
+        return None
+
+    async def claim(self, worker_id: str) -> Optional[Dict]:
+        """Claim the oldest pending job"""
+        return await self.db.claim_processing_job(worker_id)
+
+    async def complete(self, job: Dict, worker_id: str, result: Dict) -> bool:
+        """Hand a finished render back to the bot"""
+        return await self.db.finish_processing_job(job['id'], worker_id, 'completed', result=result)
+
+    async def fail(self, job: Dict, worker_id: str, error: str, retry: bool = True) -> bool:
+        """Return a job to the queue, or fail it for good once out of attempts"""
+        attempts_left = job.get('attempts', 0) < job.get('max_attempts', Config.JOB_MAX_ATTEMPTS)
+        status = 'pending' if retry and attempts_left else 'failed'
+        return await self.db.finish_processing_job(
+            job['id'], worker_id, status, error_message=error[:500]
+        )
+
+    async def requeue_stale(self) -> int:
+        """Recover jobs from workers that stopped heartbeating"""
+        return await self.db.requeue_stale_processing_jobs(Config.JOB_STALE_SECONDS)
+
+    async def take_finished(self, limit: int = 20) -> List[Dict]:
+        """Lease completed and failed jobs for delivery"""
+        return await self.db.take_finished_processing_jobs(limit, Config.JOB_DELIVERY_LEASE_SECONDS)
+
+    async def delivered(self, job: Dict) -> bool:
+        """Drop a job whose outcome reached the user"""
+        return await self.db.delete_processing_job(job['id'])
+
+    async def retry_delivery(self, job: Dict) -> bool:
+        """Offer a job for delivery again on the next poll"""
+        return await self.db.release_processing_job_delivery(job['id'])
+
+    async def run_with_heartbeat(self, job: Dict, worker_id: str, work: Awaitable[Any]) -> Any:
+        """
+        Await work while keeping the job's claim alive
+        If the claim turns out lost (the job went stale and was requeued),
+        the work is cancelled and ClaimLost raised, so two workers never
+        finish the same attempt
+        """
+        task = asyncio.ensure_future(work)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=Config.JOB_HEARTBEAT_SECONDS)
+                if done:
+                    return task.result()
+
+                # None means the database was unreachable: keep going
+                if await self.db.heartbeat_processing_job(job['id'], worker_id) is False:
+                    raise ClaimLost(f"Lost claim on job {job['id']}")
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    @staticmethod
+    def wait_seconds(job: Dict) -> float:
+        """Time the job spent queued before this claim"""
+        try:
+            created = datetime.fromisoformat(job['created_at'])
+            started = datetime.fromisoformat(job['started_at'])
+        except (KeyError, TypeError, ValueError):
+            return 0.0
+        return max(0.0, (started - created).total_seconds())
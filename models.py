@@ -0,0 +1,164 @@
+"""
+Session Models for PnProjects Audio Bot
+Compact, slotted session and render settings objects with dict conversion
+"""
+
+import time
+import weakref
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from config import Config
+
+
+class RenderSettings:
+    """
+    Immutable render settings, interned by value
+    Sessions with identical settings share one instance (most idle users
+    sit on the defaults), and the hash is computed once per instance
+    """
+
+    FIELDS = (
+        'format', 'bitrate', 'sample_rate', 'channels', 'bass_boost', 'normalize',
+        'fade_in', 'fade_out', 'speed', 'eq', 'effects'
+    )
+    __slots__ = FIELDS + ('_key', '_hash', '__weakref__')
+
+    _interned: "weakref.WeakValueDictionary[Tuple, RenderSettings]" = weakref.WeakValueDictionary()
+
+    def __init__(self, key: Tuple):
+        for name, value in zip(self.FIELDS, key):
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, '_key', key)
+        object.__setattr__(self, '_hash', hash(key))
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("RenderSettings is immutable; use replace()")
+
+    @classmethod
+    def from_dict(cls, settings: Optional[Dict] = None) -> 'RenderSettings':
+        """Build (or reuse) settings from a jsonb-style dict, filling defaults"""
+        merged = Config.default_settings()
+        merged.update({k: v for k, v in (settings or {}).items() if k in merged})
+
+        merged['eq'] = tuple(
+            (band.get('freq'), band.get('gain'), band.get('q', 1.0))
+            for band in merged['eq'] or []
+        )
+        merged['effects'] = tuple(merged['effects'] or [])
+
+        key = tuple(merged[name] for name in cls.FIELDS)
+        instance = cls._interned.get(key)
+        if instance is None:
+            instance = cls(key)
+            cls._interned[key] = instance
+        return instance
+
+    def to_dict(self) -> Dict:
+        """Plain dict in the shape stored in the settings jsonb column"""
+        settings = {name: getattr(self, name) for name in self.FIELDS}
+        settings['eq'] = [{'freq': freq, 'gain': gain, 'q': q} for freq, gain, q in self.eq]
+        settings['effects'] = list(self.effects)
+        return settings
+
+    def replace(self, **changes) -> 'RenderSettings':
+        """Settings with some fields changed"""
+        return RenderSettings.from_dict({**self.to_dict(), **changes})
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, RenderSettings) and self._key == other._key
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"RenderSettings({self.to_dict()!r})"
+
+
+class Session:
+    """
+    One user's session in memory
+    Slotted, with epoch-second timestamps, interned settings and no
+    file_info dict until a file is attached
+    """
+
+    __slots__ = (
+        'user_id', 'file_path', 'original_filename', 'file_info', 'settings',
+        'created_at', 'updated_at', 'expires_at'
+    )
+
+    def __init__(
+        self,
+        user_id: int,
+        file_path: Optional[str] = None,
+        original_filename: Optional[str] = None,
+        file_info: Optional[Dict] = None,
+        settings: Optional[RenderSettings] = None,
+        created_at: Optional[float] = None,
+        updated_at: Optional[float] = None,
+        expires_at: Optional[float] = None
+    ):
+        now = time.time()
+        self.user_id = user_id
+        self.file_path = file_path
+        self.original_filename = original_filename
+        self.file_info = file_info or None
+        self.settings = settings or RenderSettings.from_dict()
+        self.created_at = created_at or now
+        self.updated_at = updated_at or now
+        self.expires_at = expires_at or now + Config.SESSION_TIMEOUT_MINUTES * 60
+
+    @staticmethod
+    def _to_epoch(value: Any) -> Optional[float]:
+        if value is None or isinstance(value, (int, float)):
+            return value
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+
+    @staticmethod
+    def _to_datetime(value: float) -> datetime:
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Session':
+        """Build a session from a dict or database row"""
+        return cls(
+            user_id=data['user_id'],
+            file_path=data.get('file_path'),
+            original_filename=data.get('original_filename'),
+            file_info=data.get('file_info'),
+            settings=RenderSettings.from_dict(data.get('settings')),
+            created_at=cls._to_epoch(data.get('created_at')),
+            updated_at=cls._to_epoch(data.get('updated_at')),
+            expires_at=cls._to_epoch(data.get('expires_at'))
+        )
+
+    def to_dict(self) -> Dict:
+        """Session dict as handlers and the database see it (naive UTC datetimes)"""
+        return {
+            'user_id': self.user_id,
+            'file_path': self.file_path,
+            'original_filename': self.original_filename,
+            'file_info': dict(self.file_info) if self.file_info else {},
+            'settings': self.settings.to_dict(),
+            'created_at': self._to_datetime(self.created_at),
+            'updated_at': self._to_datetime(self.updated_at),
+            'expires_at': self._to_datetime(self.expires_at)
+        }
+
+    def update(self, updates: Dict):
+        """Apply field updates; a 'settings' value is a patch over the current settings"""
+        for name, value in updates.items():
+            if name == 'settings':
+                self.settings = self.settings.replace(**(value or {}))
+            elif name == 'file_info':
+                self.file_info = value or None
+            elif name in ('file_path', 'original_filename'):
+                setattr(self, name, value)
+
+    def touch(self):
+        """Mark activity and push expiry out by the session timeout"""
+        self.updated_at = time.time()
+        self.expires_at = self.updated_at + Config.SESSION_TIMEOUT_MINUTES * 60
@@ -0,0 +1,252 @@
+"""
+Result Cache for PnProjects Audio Bot
+Content-addressed, size-bounded disk cache of rendered outputs
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Disk-backed LRU cache of processed files
+    Keys combine an input identity (Telegram file_unique_id or a content
+    hash) with a canonical form of the render settings
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.path.join(Config.DOWNLOAD_LOCATION, 'cache')
+        self.max_bytes = Config.RESULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _load_index(self):
+        """Rebuild the LRU index from disk, oldest access first"""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_atime, filename, path, stat.st_size))
+
+        for _, filename, path, size in sorted(found):
+            self._entries[filename] = (path, size)
+            self.total_bytes += size
+
+        if found:
+            logger.info(
+                "Result cache loaded: %d files, %.1f MB",
+                len(found), self.total_bytes / (1024 * 1024)
+            )
+        self._evict()
+
+    @staticmethod
+    def canonical_settings(settings: Dict) -> str:
+        """Stable JSON form of render settings with defaults filled in"""
+        merged = Config.default_settings()
+        merged.update({k: v for k, v in (settings or {}).items() if k in merged})
+
+        merged['format'] = str(merged['format']).lower()
+        merged['bitrate'] = str(merged['bitrate']).lower()
+        merged['sample_rate'] = int(merged['sample_rate'])
+        merged['channels'] = int(merged['channels'])
+        merged['normalize'] = bool(merged['normalize'])
+        for key in ('bass_boost', 'fade_in', 'fade_out', 'speed'):
+            merged[key] = round(float(merged[key]), 4)
+        merged['eq'] = [
+            {k: round(float(v), 4) for k, v in sorted(band.items())}
+            for band in merged['eq'] or []
+        ]
+        merged['effects'] = [str(effect).lower() for effect in merged['effects'] or []]
+
+        return json.dumps(merged, sort_keys=True, separators=(',', ':'))
+
+    @staticmethod
+    def settings_hash(settings: Dict) -> str:
+        """Short digest of the canonical settings"""
+        return hashlib.sha256(ResultCache.canonical_settings(settings).encode()).hexdigest()[:32]
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """SHA-256 of a file's content, read in 1 MB chunks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(input_id: str, settings: Dict) -> str:
+        """Cache key for an input identity and render settings"""
+        material = f"{input_id}|{ResultCache.canonical_settings(settings)}"
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def _path_for(self, key: str, ext: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{ext}")
+
+    def get(self, key: str, ext: str) -> Optional[str]:
+        """Return the cached output path and mark it recently used"""
+        if not self.enabled:
+            return None
+
+        filename = f"{key}.{ext}"
+        entry = self._entries.get(filename)
+        if entry and os.path.exists(entry[0]):
+            self._entries.move_to_end(filename)
+            try:
+                os.utime(entry[0])
+            except OSError:
+                pass
+            self.hits += 1
+            return entry[0]
+
+        if entry:
+            self._forget(filename)
+        self.misses += 1
+        return None
+
+    def put(self, key: str, ext: str, source_path: str) -> Optional[str]:
+        """
+        Move a rendered file into the cache and return its cached path
+        Returns None (leaving the source untouched) when caching is disabled
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            size = os.path.getsize(source_path)
+            if size > self.max_bytes:
+                return None
+
+            path = self._path_for(key, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(source_path, path)
+        except OSError:
+            logger.exception("Failed to store result in cache")
+            return None
+
+        filename = os.path.basename(path)
+        if filename in self._entries:
+            self._forget(filename)
+        self._entries[filename] = (path, size)
+        self.total_bytes += size
+        self._evict()
+        return path
+
+    def _forget(self, filename: str):
+        path, size = self._entries.pop(filename)
+        self.total_bytes -= size
+
+    def _evict(self):
+        """Remove least recently used files until under the size limit"""
+        while self._entries and self.total_bytes > self.max_bytes:
+            filename, (path, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def free(self, nbytes: int) -> int:
+        """Evict least recently used files until nbytes are freed; returns bytes freed"""
+        freed = 0
+        while self._entries and freed < nbytes:
+            filename, (path, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            freed += size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return freed
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current usage"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'files': len(self._entries),
+            'bytes': self.total_bytes
+        }
+
+
+class UploadRegistry:
+    """
+    Local store mapping (input id, settings hash) to the Telegram file_id
+    of an already uploaded output, persisted as JSON under the downloads volume
+    Used when the database is not connected
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 10000):
+        self.path = path or os.path.join(Config.DOWNLOAD_LOCATION, 'uploaded_outputs.json')
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+        try:
+            with open(self.path, 'r') as f:
+                self._entries.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            logger.exception("Failed to load upload registry")
+
+    @staticmethod
+    def _key(input_id: str, settings_hash: str) -> str:
+        return f"{input_id}|{settings_hash}"
+
+    def get(self, input_id: str, settings_hash: str) -> Optional[Dict]:
+        """Return {'file_id', 'file_size'} for a previous upload"""
+        key = self._key(input_id, settings_hash)
+        entry = self._entries.get(key)
+        if entry:
+            self._entries.move_to_end(key)
+        return entry
+
+    def save(self, input_id: str, settings_hash: str, file_id: str, file_size: int = 0):
+        """Record an upload and persist the registry"""
+        key = self._key(input_id, settings_hash)
+        self._entries[key] = {'file_id': file_id, 'file_size': file_size}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._persist()
+
+    def delete(self, input_id: str, settings_hash: str):
+        """Forget an upload whose file_id stopped working"""
+        if self._entries.pop(self._key(input_id, settings_hash), None) is not None:
+            self._persist()
+
+    def _persist(self):
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            logger.exception("Failed to persist upload registry")
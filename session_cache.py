@@ -0,0 +1,199 @@
+"""
+Session Cache for PnProjects Audio Bot
+Write-behind, in-process cache of database sessions
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+from config import Config
+from database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCache:
+    """
+    Serves session reads from memory and batches writes to the database
+    Updates are applied locally and marked dirty; a background task flushes
+    dirty sessions in one upsert every flush interval, and close() flushes
+    whatever is left on shutdown. Settings travel as partial patches merged
+    server-side, never as whole-dict replacements. Local expiry mirrors the
+    database trigger, so an idle session still lapses after SESSION_TIMEOUT_MINUTES
+    """
+
+    # Columns written back by the batched upsert (settings go through patches)
+    COLUMNS = ('user_id', 'file_path', 'original_filename', 'file_info')
+
+    def __init__(self, db: DatabaseManager, flush_interval: Optional[float] = None):
+        self.db = db
+        self.flush_interval = Config.SESSION_FLUSH_INTERVAL_SECONDS if flush_interval is None else flush_interval
+        self._sessions: Dict[int, Dict] = {}
+        self._expires: Dict[int, datetime] = {}
+        self._dirty: set = set()
+        self._patches: Dict[int, Dict] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _parse_expiry(value) -> datetime:
+        if isinstance(value, datetime):
+            return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        try:
+            parsed = datetime.fromisoformat(str(value))
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+        except ValueError:
+            return SessionCache._new_expiry()
+
+    @staticmethod
+    def _new_expiry() -> datetime:
+        return datetime.now(timezone.utc) + timedelta(minutes=Config.SESSION_TIMEOUT_MINUTES)
+
+    def _store(self, user_id: int, session: Dict) -> Dict:
+        self._sessions[user_id] = session
+        self._expires[user_id] = self._parse_expiry(session.get('expires_at'))
+        return session
+
+    def _forget(self, user_id: int):
+        self._sessions.pop(user_id, None)
+        self._expires.pop(user_id, None)
+        self._dirty.discard(user_id)
+        self._patches.pop(user_id, None)
+
+    async def get(self, user_id: int) -> Optional[Dict]:
+        """Return the user's active session, loading it on a miss"""
+        session = self._sessions.get(user_id)
+        if session:
+            if self._expires[user_id] > datetime.now(timezone.utc):
+                return session
+            self._forget(user_id)
+
+        session = await self.db.get_user_session(user_id)
+        if session:
+            return self._store(user_id, session)
+        return None
+
+    async def create(self, user_id: int, **kwargs) -> Optional[Dict]:
+        """Create a session in the database right away, so it has an id"""
+        session = await self.db.create_user_session(user_id, **kwargs)
+        if session:
+            return self._store(user_id, session)
+        return None
+
+    async def update(self, user_id: int, updates: Dict) -> bool:
+        """
+        Apply updates in memory and queue them for the next flush
+        A 'settings' value is treated as a patch over the current settings
+        """
+        session = await self.get(user_id)
+        if not session:
+            return False
+
+        updates = dict(updates)
+        patch = updates.pop('settings', None)
+        if patch:
+            session['settings'] = {**(session.get('settings') or {}), **patch}
+            self._patches.setdefault(user_id, {}).update(patch)
+        if updates:
+            session.update(updates)
+            self._dirty.add(user_id)
+
+        self._expires[user_id] = self._new_expiry()
+        session['expires_at'] = self._expires[user_id].isoformat()
+        self._schedule()
+        return True
+
+    async def update_settings(self, user_id: int, patch: Dict) -> bool:
+        """Merge a partial settings change; flushed as a server-side jsonb merge"""
+        return await self.update(user_id, {'settings': patch})
+
+    def _schedule(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wake.set()
+
+    async def delete(self, user_id: int) -> bool:
+        """Drop the session locally and in the database"""
+        session = self._sessions.get(user_id)
+        self._forget(user_id)
+        if session is None:
+            session = await self.db.get_user_session(user_id)
+        if session:
+            return await self.db.delete_user_session(session['id'])
+        return False
+
+    def expire(self, on_expire: Optional[Callable[[int, Dict], None]] = None) -> int:
+        """
+        Drop cached sessions past their expiry, including unflushed ones
+        on_expire(user_id, session) runs for each dropped session
+        """
+        now = datetime.now(timezone.utc)
+        expired = [user_id for user_id, expires in self._expires.items() if expires <= now]
+        for user_id in expired:
+            session = self._sessions.get(user_id)
+            self._forget(user_id)
+            if on_expire and session:
+                on_expire(user_id, session)
+        return len(expired)
+
+    async def flush(self) -> int:
+        """
+        Write dirty sessions in one upsert and settings patches concurrently
+        Returns the number of sessions written
+        """
+        if not self._dirty and not self._patches:
+            return 0
+
+        batch = [user_id for user_id in self._dirty if user_id in self._sessions]
+        patches = self._patches
+        self._dirty = set()
+        self._patches = {}
+
+        rows = [
+            {column: self._sessions[user_id].get(column) for column in self.COLUMNS}
+            for user_id in batch
+        ]
+        written = set(batch)
+        if rows and not await self.db.upsert_user_sessions(rows):
+            # Keep them for the next attempt unless they expired meanwhile
+            self._dirty.update(user_id for user_id in batch if user_id in self._sessions)
+            written.clear()
+
+        merged = await asyncio.gather(*(
+            self.db.merge_session_settings(user_id, patch)
+            for user_id, patch in patches.items()
+        ))
+        for (user_id, patch), ok in zip(patches.items(), merged):
+            if ok:
+                written.add(user_id)
+            elif user_id in self._sessions:
+                self._patches[user_id] = {**patch, **self._patches.get(user_id, {})}
+
+        return len(written)
+
+    async def _run(self):
+        while True:
+            if not self._dirty and not self._patches:
+                self._wake.clear()
+                await self._wake.wait()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error flushing sessions")
+
+    async def close(self):
+        """Stop the flush task and write pending changes"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        written = await self.flush()
+        if written:
+            logger.info("Flushed %d sessions on shutdown", written)
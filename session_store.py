@@ -0,0 +1,315 @@
+"""
+Session Store for PnProjects Audio Bot
+One session interface over in-memory, embedded SQLite and Supabase backends
+"""
+
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+from config import Config
+from database import DatabaseManager, InMemorySessionManager
+from session_cache import SessionCache
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore(ABC):
+    """
+    Per-user session storage
+    Every backend creates sessions with Config.default_settings(), extends
+    expiry by SESSION_TIMEOUT_MINUTES on each update and treats settings
+    updates as patches over the current settings. on_expire(user_id, session)
+    is called for sessions that lapse, so their files can be released
+    """
+
+    name = "base"
+    on_expire: Optional[Callable[[int, Dict], None]] = None
+
+    def _notify_expired(self, user_id: int, session: Dict):
+        if self.on_expire:
+            try:
+                self.on_expire(user_id, session)
+            except Exception:
+                logger.exception("Error in session expiry callback")
+
+    @staticmethod
+    def default_session(user_id: int) -> Dict:
+        """Session structure used when a backend has no row for the user"""
+        return {
+            'user_id': user_id,
+            'file_path': None,
+            'original_filename': None,
+            'file_info': {},
+            'settings': Config.default_settings()
+        }
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[Dict]:
+        """Active session for a user, or None"""
+
+    @abstractmethod
+    async def create(self, user_id: int) -> Optional[Dict]:
+        """Start a fresh session with default settings"""
+
+    @abstractmethod
+    async def update(self, user_id: int, updates: Dict) -> bool:
+        """Update session fields and extend expiry"""
+
+    @abstractmethod
+    async def update_settings(self, user_id: int, patch: Dict) -> bool:
+        """Merge a partial settings change"""
+
+    @abstractmethod
+    async def delete(self, user_id: int) -> bool:
+        """Remove a user's session"""
+
+    @abstractmethod
+    async def cleanup_expired(self) -> int:
+        """Remove expired sessions and return how many went"""
+
+    async def close(self):
+        """Release backend resources"""
+
+    @staticmethod
+    def from_config(
+        db: DatabaseManager,
+        on_expire: Optional[Callable[[int, Dict], None]] = None
+    ) -> 'SessionStore':
+        """
+        Build the backend named by Config.SESSION_BACKEND
+        "auto" uses Supabase when it is configured and memory otherwise
+        """
+        backend = Config.SESSION_BACKEND.lower()
+        if backend == "auto":
+            backend = "supabase" if db.is_connected else "memory"
+
+        if backend == "supabase" and not db.is_connected:
+            logger.warning("Supabase session backend requested but not configured, using memory")
+            backend = "memory"
+
+        if backend == "sqlite":
+            store = SQLiteSessionStore()
+        elif backend == "supabase":
+            store = SupabaseSessionStore(db)
+        else:
+            store = MemorySessionStore()
+
+        store.on_expire = on_expire
+        logger.info("Session backend: %s", store.name)
+        return store
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions held in process memory; lost on restart
+    A reaper task sleeps until the earliest expiry, so sessions are released
+    when they lapse rather than on the next cleanup tick
+    """
+
+    name = "memory"
+
+    def __init__(self, manager: Optional[InMemorySessionManager] = None):
+        self.manager = manager or InMemorySessionManager()
+        self.manager.on_expire = self._notify_expired
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def _reap(self):
+        while True:
+            next_expiry = self.manager.seconds_until_next_expiry()
+            delay = Config.CLEANUP_INTERVAL_SECONDS
+            if next_expiry is not None:
+                delay = min(delay, next_expiry)
+            await asyncio.sleep(delay)
+            self.manager.cleanup_expired()
+
+    async def get(self, user_id: int) -> Optional[Dict]:
+        return self.manager.get_session(user_id)
+
+    async def create(self, user_id: int) -> Optional[Dict]:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+        return self.manager.create_session(user_id)
+
+    async def update(self, user_id: int, updates: Dict) -> bool:
+        return self.manager.update_session(user_id, updates)
+
+    async def update_settings(self, user_id: int, patch: Dict) -> bool:
+        return self.manager.update_session(user_id, {'settings': patch})
+
+    async def delete(self, user_id: int) -> bool:
+        return self.manager.delete_session(user_id)
+
+    async def cleanup_expired(self) -> int:
+        return self.manager.cleanup_expired()
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in an embedded SQLite database in WAL mode
+    Restart-safe for single-node deployments; each call is a local
+    sub-millisecond transaction, so it runs directly on the event loop
+    """
+
+    name = "sqlite"
+
+    # JSON-encoded columns
+    JSON_COLUMNS = ('file_info', 'settings')
+    COLUMNS = ('file_path', 'original_filename', 'file_info', 'settings')
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.SESSION_DB_PATH
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_sessions (
+                user_id INTEGER PRIMARY KEY,
+                file_path TEXT,
+                original_filename TEXT,
+                file_info TEXT NOT NULL DEFAULT '{}',
+                settings TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at ON user_sessions(expires_at)"
+        )
+
+    @staticmethod
+    def _expiry(now: float) -> float:
+        return now + Config.SESSION_TIMEOUT_MINUTES * 60
+
+    def _to_session(self, row: sqlite3.Row) -> Dict:
+        session = dict(row)
+        for column in self.JSON_COLUMNS:
+            session[column] = json.loads(session[column] or '{}')
+        for column in ('created_at', 'updated_at', 'expires_at'):
+            session[column] = datetime.fromtimestamp(session[column], timezone.utc).isoformat()
+        return session
+
+    async def get(self, user_id: int) -> Optional[Dict]:
+        row = self._conn.execute(
+            "SELECT * FROM user_sessions WHERE user_id = ? AND expires_at > ?",
+            (user_id, time.time())
+        ).fetchone()
+        return self._to_session(row) if row else None
+
+    async def create(self, user_id: int) -> Optional[Dict]:
+        now = time.time()
+        session = self.default_session(user_id)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO user_sessions "
+            "(user_id, file_path, original_filename, file_info, settings, created_at, updated_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                user_id, None, None,
+                json.dumps(session['file_info']), json.dumps(session['settings']),
+                now, now, self._expiry(now)
+            )
+        )
+        return await self.get(user_id)
+
+    async def update(self, user_id: int, updates: Dict) -> bool:
+        updates = dict(updates)
+        patch = updates.pop('settings', None)
+        if patch and not await self.update_settings(user_id, patch):
+            return False
+
+        fields = {key: value for key, value in updates.items() if key in self.COLUMNS}
+        now = time.time()
+        assignments = ''.join(f"{key} = ?, " for key in fields)
+        values = [json.dumps(value) if key in self.JSON_COLUMNS else value for key, value in fields.items()]
+
+        cursor = self._conn.execute(
+            f"UPDATE user_sessions SET {assignments}updated_at = ?, expires_at = ? "
+            "WHERE user_id = ? AND expires_at > ?",
+            (*values, now, self._expiry(now), user_id, now)
+        )
+        return cursor.rowcount > 0
+
+    async def update_settings(self, user_id: int, patch: Dict) -> bool:
+        now = time.time()
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT settings FROM user_sessions WHERE user_id = ? AND expires_at > ?",
+                (user_id, now)
+            ).fetchone()
+            if not row:
+                return False
+
+            settings = {**json.loads(row['settings']), **patch}
+            self._conn.execute(
+                "UPDATE user_sessions SET settings = ?, updated_at = ?, expires_at = ? WHERE user_id = ?",
+                (json.dumps(settings), now, self._expiry(now), user_id)
+            )
+        return True
+
+    async def delete(self, user_id: int) -> bool:
+        cursor = self._conn.execute("DELETE FROM user_sessions WHERE user_id = ?", (user_id,))
+        return cursor.rowcount > 0
+
+    async def cleanup_expired(self) -> int:
+        now = time.time()
+        expired = self._conn.execute(
+            "SELECT * FROM user_sessions WHERE expires_at <= ?", (now,)
+        ).fetchall()
+        if not expired:
+            return 0
+
+        self._conn.execute("DELETE FROM user_sessions WHERE expires_at <= ?", (now,))
+        for row in expired:
+            self._notify_expired(row['user_id'], self._to_session(row))
+
+        logger.info("Cleaned up %d expired sessions", len(expired))
+        return len(expired)
+
+    async def close(self):
+        self._conn.close()
+
+
+class SupabaseSessionStore(SessionStore):
+    """Sessions in Supabase behind the write-behind SessionCache"""
+
+    name = "supabase"
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self.cache = SessionCache(db)
+
+    async def get(self, user_id: int) -> Optional[Dict]:
+        return await self.cache.get(user_id)
+
+    async def create(self, user_id: int) -> Optional[Dict]:
+        return await self.cache.create(user_id)
+
+    async def update(self, user_id: int, updates: Dict) -> bool:
+        return await self.cache.update(user_id, updates)
+
+    async def update_settings(self, user_id: int, patch: Dict) -> bool:
+        return await self.cache.update_settings(user_id, patch)
+
+    async def delete(self, user_id: int) -> bool:
+        return await self.cache.delete(user_id)
+
+    async def cleanup_expired(self) -> int:
+        self.cache.expire(self._notify_expired)
+        return await self.db.cleanup_expired_sessions()
+
+    async def close(self):
+        await self.cache.close()
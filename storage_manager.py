@@ -0,0 +1,184 @@
+"""
+Storage Manager for PnProjects Audio Bot
+Disk quota, space reservations and orphan cleanup for the downloads directory
+"""
+
+import os
+import time
+import glob
+import shutil
+import logging
+from typing import Dict, Optional, Tuple
+from config import Config
+from result_cache import ResultCache
+from input_store import InputStore
+
+logger = logging.getLogger(__name__)
+
+
+class StorageManager:
+    """
+    Keeps the downloads directory inside its disk budget
+    Downloads and renders reserve their estimated size up front; when the
+    budget or the disk is short, cached outputs and then unreferenced
+    inputs are evicted least recently used first
+    """
+
+    # Temp files from downloads and renders that died before cleaning up
+    ORPHAN_PATTERNS = (
+        '*_input.*', '*_output.*',
+        '*_eq.wav', '*_effects.wav', '*_norm.wav', '*_3d.wav',
+        '*.tmp'
+    )
+    PART_PATTERNS = ('*.part', '*.part.json')
+
+    # Why the last reserve() call returned None
+    TOO_LARGE = 'too_large'
+    USER_QUOTA = 'user_quota'
+    STORAGE_FULL = 'storage_full'
+
+    def __init__(
+        self,
+        result_cache: ResultCache,
+        input_store: InputStore,
+        root: Optional[str] = None,
+        quota_bytes: Optional[int] = None,
+        user_quota_bytes: Optional[int] = None
+    ):
+        self.result_cache = result_cache
+        self.input_store = input_store
+        self.root = root or Config.DOWNLOAD_LOCATION
+        self.quota_bytes = Config.STORAGE_QUOTA_BYTES if quota_bytes is None else quota_bytes
+        self.user_quota_bytes = Config.USER_STORAGE_QUOTA_BYTES if user_quota_bytes is None else user_quota_bytes
+        self.rejections = 0
+        self.last_rejection: Optional[str] = None
+        self._reservations: Dict[int, Tuple[int, int]] = {}
+        self._next_token = 0
+
+    # Output formats stored as (at most) uncompressed PCM
+    LOSSLESS_FORMATS = ('flac', 'wav', 'alac', 'ape', 'wv', 'tta', 'aiff', 'aif')
+
+    @staticmethod
+    def estimate_output_bytes(duration: float, settings: Dict) -> int:
+        """
+        Upper bound for a rendered file: 16-bit PCM for lossless formats,
+        the target bitrate (plus headroom) for lossy ones
+        """
+        if settings.get('format', 'mp3') in StorageManager.LOSSLESS_FORMATS:
+            return int(duration * settings.get('sample_rate', 48000) * settings.get('channels', 2) * 2)
+
+        bitrate = str(settings.get('bitrate', '320k')).lower().rstrip('k')
+        try:
+            kbps = float(bitrate)
+        except ValueError:
+            kbps = 320.0
+        return int(duration * kbps * 1000 / 8 * 1.1) + 1024 * 1024
+
+    def reserved_bytes(self, user_id: Optional[int] = None) -> int:
+        """Outstanding reservations, for one user or everyone"""
+        return sum(
+            nbytes for owner, nbytes in self._reservations.values()
+            if user_id is None or owner == user_id
+        )
+
+    def used_bytes(self) -> int:
+        """Bytes held by stored inputs, cached outputs and reservations"""
+        return self.result_cache.total_bytes + self.input_store.total_bytes() + self.reserved_bytes()
+
+    def user_bytes(self, user_id: int) -> int:
+        """Bytes charged to a user: referenced inputs plus reservations"""
+        return self.input_store.user_bytes(user_id) + self.reserved_bytes(user_id)
+
+    def make_room(self, nbytes: int) -> int:
+        """Evict cached outputs, then unreferenced inputs; returns bytes freed"""
+        freed = self.result_cache.free(nbytes)
+        if freed < nbytes:
+            freed += self.input_store.evict_unreferenced(nbytes - freed)
+        return freed
+
+    def reserve(self, user_id: int, nbytes: int) -> Optional[int]:
+        """
+        Reserve space before a download or render
+        Returns a token for release(), or None if the space cannot be found;
+        last_rejection then says whether the request can never fit
+        (TOO_LARGE), the user is over their quota (USER_QUOTA) or the server
+        is short of space (STORAGE_FULL)
+        """
+        self.last_rejection = None
+        if any(0 < limit < nbytes for limit in (self.user_quota_bytes, self.quota_bytes)):
+            return self._reject(self.TOO_LARGE, "Request of %d bytes exceeds the storage quota", nbytes)
+
+        if self.user_quota_bytes and self.user_bytes(user_id) + nbytes > self.user_quota_bytes:
+            return self._reject(
+                self.USER_QUOTA, "User %s over storage quota (%d bytes requested)", user_id, nbytes
+            )
+
+        shortfall = 0
+        if self.quota_bytes:
+            shortfall = self.used_bytes() + nbytes - self.quota_bytes
+
+        try:
+            free = shutil.disk_usage(self.root).free
+            shortfall = max(shortfall, self.reserved_bytes() + nbytes + Config.STORAGE_MIN_FREE_BYTES - free)
+        except OSError:
+            pass
+
+        if shortfall > 0 and self.make_room(shortfall) < shortfall:
+            return self._reject(
+                self.STORAGE_FULL, "Storage full: could not free %d bytes for user %s", shortfall, user_id
+            )
+
+        self._next_token += 1
+        self._reservations[self._next_token] = (user_id, nbytes)
+        return self._next_token
+
+    def _reject(self, reason: str, message: str, *args) -> None:
+        logger.warning(message, *args)
+        self.rejections += 1
+        self.last_rejection = reason
+        return None
+
+    def release(self, token: Optional[int]):
+        """Return a reservation once its files are written or discarded"""
+        if token is not None:
+            self._reservations.pop(token, None)
+
+    def sweep_orphans(self) -> int:
+        """
+        Remove temp files left behind by crashed downloads and renders
+        Partial downloads are kept for resuming until they go stale
+        Returns the number of files removed
+        """
+        now = time.time()
+        removed = 0
+        freed = 0
+
+        for patterns, max_age in (
+            (self.ORPHAN_PATTERNS, Config.ORPHAN_MAX_AGE_SECONDS),
+            (self.PART_PATTERNS, Config.PART_FILE_MAX_AGE_SECONDS)
+        ):
+            for pattern in patterns:
+                for path in glob.glob(os.path.join(self.root, pattern)):
+                    try:
+                        stat = os.stat(path)
+                        if now - stat.st_mtime < max_age:
+                            continue
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    removed += 1
+                    freed += stat.st_size
+
+        if removed:
+            logger.info("Removed %d orphaned files (%.1f MB)", removed, freed / (1024 * 1024))
+        return removed
+
+    def stats(self) -> Dict:
+        """Current usage against the configured budget"""
+        return {
+            'used': self.used_bytes(),
+            'quota': self.quota_bytes,
+            'reserved': self.reserved_bytes(),
+            'reservations': len(self._reservations),
+            'rejections': self.rejections
+        }
@@ -0,0 +1,22 @@
+/*
+  # Local Supabase Stand-in Roles
+  Recreates the roles Supabase provides so the migrations and PostgREST
+  behave the same against a plain Postgres container.
+  Runs before the migrations on first database start.
+*/
+
+CREATE ROLE anon NOLOGIN;
+CREATE ROLE authenticated NOLOGIN;
+CREATE ROLE service_role NOLOGIN BYPASSRLS;
+
+CREATE ROLE authenticator LOGIN NOINHERIT PASSWORD 'postgres';
+GRANT anon, authenticated, service_role TO authenticator;
+
+GRANT USAGE ON SCHEMA public TO anon, authenticated, service_role;
+
+ALTER DEFAULT PRIVILEGES IN SCHEMA public
+  GRANT ALL ON TABLES TO anon, authenticated, service_role;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public
+  GRANT ALL ON SEQUENCES TO anon, authenticated, service_role;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public
+  GRANT EXECUTE ON FUNCTIONS TO anon, authenticated, service_role;
@@ -0,0 +1,11 @@
+#!/bin/sh
+# Apply every migration in order on first database start
+set -e
+
+for migration in /migrations/*.sql; do
+  echo "Applying $migration"
+  psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" -f "$migration"
+done
+
+# Let PostgREST pick up the new schema
+psql --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" -c "NOTIFY pgrst, 'reload schema'"
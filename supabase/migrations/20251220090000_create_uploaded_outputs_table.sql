@@ -0,0 +1,34 @@
+/*
+  # Uploaded Outputs Registry
+
+  1. New Tables
+    - `uploaded_outputs`
+      - `input_id` (text) - Input identity (Telegram file_unique_id or content hash)
+      - `settings_hash` (text) - Digest of the canonical render settings
+      - `file_id` (text) - Telegram file_id of the uploaded output
+      - `file_size` (bigint) - Output size in bytes
+      - `created_at` (timestamptz) - Upload time
+
+  2. Security
+    - Enable RLS
+    - Bot has full access
+
+  3. Indexes
+    - Primary key on (input_id, settings_hash) for lookups and upserts
+*/
+
+CREATE TABLE IF NOT EXISTS uploaded_outputs (
+  input_id text NOT NULL,
+  settings_hash text NOT NULL,
+  file_id text NOT NULL,
+  file_size bigint DEFAULT 0,
+  created_at timestamptz DEFAULT now(),
+  PRIMARY KEY (input_id, settings_hash)
+);
+
+ALTER TABLE uploaded_outputs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow bot full access to uploaded_outputs"
+  ON uploaded_outputs FOR ALL
+  USING (true)
+  WITH CHECK (true);
@@ -0,0 +1,40 @@
+/*
+  # One Session per User and Server-side Settings Merge
+
+  1. Changes
+    - Remove duplicate `user_sessions` rows, keeping the most recently updated
+      one per `user_id` (queue rows of removed sessions cascade with them)
+    - Replace the plain `user_id` index with a unique one so session writes
+      can upsert on `user_id`
+
+  2. New Functions
+    - `merge_session_settings(p_user_id, p_patch)` - Merges a partial settings
+      patch into the active session's `settings` jsonb in a single statement
+      and returns the updated row (none if the session expired)
+
+  3. Security
+    - Bot roles may execute the function
+*/
+
+-- Keep only the newest session per user
+DELETE FROM user_sessions s
+USING user_sessions newer
+WHERE s.user_id = newer.user_id
+  AND (s.updated_at, s.id) < (newer.updated_at, newer.id);
+
+DROP INDEX IF EXISTS idx_user_sessions_user_id;
+CREATE UNIQUE INDEX IF NOT EXISTS user_sessions_user_id_key ON user_sessions(user_id);
+
+-- Merge a settings patch without a read-modify-write round trip
+CREATE OR REPLACE FUNCTION merge_session_settings(p_user_id bigint, p_patch jsonb)
+RETURNS SETOF user_sessions
+LANGUAGE sql
+AS $$
+  UPDATE user_sessions
+     SET settings = COALESCE(settings, '{}'::jsonb) || p_patch
+   WHERE user_id = p_user_id
+     AND expires_at > now()
+  RETURNING *;
+$$;
+
+GRANT EXECUTE ON FUNCTION merge_session_settings(bigint, jsonb) TO anon, authenticated, service_role;
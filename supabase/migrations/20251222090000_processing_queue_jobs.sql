@@ -0,0 +1,109 @@
+/*
+  # Render Jobs on processing_queue
+
+  1. Changes
+    - `processing_queue` gains the columns a worker needs to run a job
+      - `payload` (jsonb) - Input file, settings and chat to report back to
+      - `result` (jsonb) - Output path and timings written by the worker
+      - `attempts` (integer) - Claims so far, including crashed ones
+      - `max_attempts` (integer) - Claims allowed before the job fails
+      - `worker_id` (text) - Worker currently holding the job
+      - `heartbeat_at` (timestamptz) - Last sign of life from that worker
+      - `delivering_at` (timestamptz) - When the bot took the finished job for upload
+      - `delivery_attempts` (integer) - Times the bot has taken it
+    - Partial index over pending jobs in arrival order
+
+  2. New Functions
+    - `claim_processing_job(p_worker_id)` - Takes the oldest pending job with
+      `FOR UPDATE SKIP LOCKED`, so concurrent workers never block on or
+      double-claim a row, and marks it processing
+    - `requeue_stale_processing_jobs(p_stale_seconds)` - Returns jobs whose
+      worker stopped heartbeating to pending, or fails them once they are
+      out of attempts; returns the number of jobs touched
+    - `take_finished_processing_jobs(p_limit, p_lease_seconds)` - Leases
+      completed and failed jobs to the bot for delivery and returns them;
+      the bot deletes a job once delivered, and a lease that runs out (the
+      bot crashed mid-upload) makes the job available again
+
+  3. Security
+    - Bot roles may execute the functions
+*/
+
+ALTER TABLE processing_queue ADD COLUMN IF NOT EXISTS payload jsonb NOT NULL DEFAULT '{}'::jsonb;
+ALTER TABLE processing_queue ADD COLUMN IF NOT EXISTS result jsonb;
+ALTER TABLE processing_queue ADD COLUMN IF NOT EXISTS attempts integer NOT NULL DEFAULT 0;
+ALTER TABLE processing_queue ADD COLUMN IF NOT EXISTS max_attempts integer NOT NULL DEFAULT 3;
+ALTER TABLE processing_queue ADD COLUMN IF NOT EXISTS worker_id text;
+ALTER TABLE processing_queue ADD COLUMN IF NOT EXISTS heartbeat_at timestamptz;
+ALTER TABLE processing_queue ADD COLUMN IF NOT EXISTS delivering_at timestamptz;
+ALTER TABLE processing_queue ADD COLUMN IF NOT EXISTS delivery_attempts integer NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_processing_queue_pending
+  ON processing_queue(created_at)
+  WHERE status = 'pending';
+
+-- Claim the oldest pending job without waiting on rows other workers hold
+CREATE OR REPLACE FUNCTION claim_processing_job(p_worker_id text)
+RETURNS SETOF processing_queue
+LANGUAGE sql
+AS $$
+  UPDATE processing_queue q
+     SET status = 'processing',
+         worker_id = p_worker_id,
+         attempts = q.attempts + 1,
+         started_at = now(),
+         heartbeat_at = now(),
+         error_message = NULL
+   WHERE q.id = (
+           SELECT id
+             FROM processing_queue
+            WHERE status = 'pending'
+            ORDER BY created_at
+            LIMIT 1
+              FOR UPDATE SKIP LOCKED
+         )
+  RETURNING q.*;
+$$;
+
+-- Recover jobs from workers that crashed or lost their connection
+CREATE OR REPLACE FUNCTION requeue_stale_processing_jobs(p_stale_seconds integer)
+RETURNS integer
+LANGUAGE sql
+AS $$
+  WITH stale AS (
+    UPDATE processing_queue
+       SET status = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END,
+           error_message = 'Worker stopped responding',
+           completed_at = CASE WHEN attempts < max_attempts THEN NULL ELSE now() END,
+           worker_id = NULL
+     WHERE status = 'processing'
+       AND heartbeat_at < now() - make_interval(secs => p_stale_seconds)
+    RETURNING 1
+  )
+  SELECT count(*)::integer FROM stale;
+$$;
+
+-- Lease finished jobs to the bot; they are deleted only after delivery
+CREATE OR REPLACE FUNCTION take_finished_processing_jobs(p_limit integer, p_lease_seconds integer)
+RETURNS SETOF processing_queue
+LANGUAGE sql
+AS $$
+  UPDATE processing_queue q
+     SET delivering_at = now(),
+         delivery_attempts = q.delivery_attempts + 1
+   WHERE q.id IN (
+           SELECT id
+             FROM processing_queue
+            WHERE status IN ('completed', 'failed')
+              AND (delivering_at IS NULL
+                   OR delivering_at < now() - make_interval(secs => p_lease_seconds))
+            ORDER BY completed_at
+            LIMIT p_limit
+              FOR UPDATE SKIP LOCKED
+         )
+  RETURNING q.*;
+$$;
+
+GRANT EXECUTE ON FUNCTION claim_processing_job(text) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION requeue_stale_processing_jobs(integer) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION take_finished_processing_jobs(integer, integer) TO anon, authenticated, service_role;
@@ -0,0 +1,147 @@
+"""
+Render Worker for PnProjects Audio Bot
+Claims render jobs from the processing queue and renders them: python worker.py
+Run as many as needed next to the bot; they share its downloads directory
+"""
+
+import os
+import time
+import socket
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from config import Config
+from database import DatabaseManager
+from job_queue import ClaimLost, JobFailed, JobQueue
+from audio_processor import AdvancedAudioProcessor
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+class RenderWorker:
+    """
+    Claims one job at a time, renders it and reports the outcome
+    Transient errors (out of memory or disk) are retried on another claim;
+    a missing input, settings that cannot be rendered or a render that
+    kills its DSP worker fail the job straight away. Every attempt renders
+    to its own path, so a worker that lost its claim cannot clobber the next
+    one. Each worker also recovers jobs abandoned by crashed workers
+    """
+
+    def __init__(self, queue: JobQueue, worker_id: Optional[str] = None):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._last_recovery = 0.0
+
+    async def run(self):
+        """Poll for jobs until cancelled"""
+        logger.info("Render worker %s started", self.worker_id)
+        while True:
+            try:
+                if time.monotonic() - self._last_recovery >= Config.JOB_STALE_SECONDS / 2:
+                    self._last_recovery = time.monotonic()
+                    await self.queue.requeue_stale()
+
+                job = await self.queue.claim(self.worker_id)
+                if job is None:
+                    await asyncio.sleep(Config.JOB_POLL_INTERVAL_SECONDS)
+                    continue
+
+                await self.process(job)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error in worker loop")
+                await asyncio.sleep(Config.JOB_POLL_INTERVAL_SECONDS)
+
+    @staticmethod
+    def attempt_output(payload: Dict, job: Dict) -> str:
+        """Output path for this claim of the job"""
+        base, ext = os.path.splitext(payload['output_file'])
+        return f"{base}.attempt{job.get('attempts', 1)}{ext}"
+
+    @staticmethod
+    def _discard(path: str):
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def process(self, job: Dict):
+        """Render a claimed job and record the outcome with timings"""
+        payload = job.get('payload') or {}
+        output_file = self.attempt_output(payload, job)
+        wait_seconds = JobQueue.wait_seconds(job)
+        started = time.monotonic()
+
+        try:
+            await self.queue.run_with_heartbeat(
+                job, self.worker_id, self.render(payload, output_file)
+            )
+        except ClaimLost as e:
+            logger.warning("%s; abandoning its render", e)
+            self._discard(output_file)
+            return
+        except JobFailed as e:
+            logger.warning("Job %s failed: %s", job['id'], e)
+            self._discard(output_file)
+            await self.queue.fail(job, self.worker_id, str(e), retry=False)
+            return
+        except Exception as e:
+            logger.exception("Job %s crashed (attempt %s)", job['id'], job.get('attempts'))
+            self._discard(output_file)
+            await self.queue.fail(job, self.worker_id, str(e) or type(e).__name__)
+            return
+
+        render_seconds = time.monotonic() - started
+        completed = await self.queue.complete(job, self.worker_id, {
+            'output_file': output_file,
+            'wait_seconds': round(wait_seconds, 3),
+            'render_seconds': round(render_seconds, 3)
+        })
+        if not completed:
+            logger.warning("Job %s was taken over before it finished; dropping output", job['id'])
+            self._discard(output_file)
+            return
+
+        logger.info(
+            "Job %s done: waited %.1fs, rendered in %.1fs",
+            job['id'], wait_seconds, render_seconds
+        )
+
+    async def render(self, payload: Dict, output_file: str):
+        """Render the job's input into output_file"""
+        input_file = payload.get('input_file')
+        if not input_file or not os.path.exists(input_file):
+            raise JobFailed("Input file not found")
+
+        success = await AdvancedAudioProcessor.render_for_settings(
+            input_file, output_file, payload.get('settings') or {},
+            audio_info=payload.get('audio_info') or None
+        )
+
+        if not success or not os.path.exists(output_file):
+            raise JobFailed("Processing failed")
+
+
+async def main():
+    db = DatabaseManager()
+    if not db.is_connected:
+        raise SystemExit("The render worker needs Supabase (SUPABASE_URL and SUPABASE_ANON_KEY)")
+
+    worker = RenderWorker(JobQueue(db))
+    try:
+        await worker.run()
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass